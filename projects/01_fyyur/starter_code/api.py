@@ -0,0 +1,251 @@
+"""
+Read-only JSON API over SQLAlchemy models, versioned by its URL prefix.
+
+Every resource is served as a collection (/<name>) and by id
+(/<name>/<id>), and the client decides what it gets:
+
+    fields=name,city            only these columns (and id) are selected
+                                from the database and returned
+    include=shows               related rows, fetched with one extra query
+                                per include for the whole page
+    fields[shows]=start_time    columns of an included resource
+    limit[shows]=5              included rows per parent (to-many only)
+    limit=20&cursor=...         keyset pages in the resource's order; the
+                                response carries next_cursor while rows
+                                remain
+
+Cursors are opaque: the order key of the last row, JSON encoded in url-safe
+base64, so the next page is an index seek whatever its depth.
+"""
+import base64
+import binascii
+import json
+from collections import namedtuple
+from datetime import datetime
+
+from flask import Blueprint, jsonify, request
+from sqlalchemy import DateTime, and_, func, or_
+
+Include = namedtuple('Include', 'resource key parent_key many limit')
+
+
+class ApiError(Exception):
+
+    def __init__(self, status, message):
+        super(ApiError, self).__init__(message)
+        self.status = status
+        self.message = message
+
+
+class Resource(object):
+    """
+    A model exposed through the API.
+
+    :param columns: names of the columns clients may select; must include id
+    :param default_fields: returned when the request has no fields=
+    :param order: column names of the page order, ending with a unique one
+    :param criteria: callable returning the filters for visible rows
+    """
+
+    def __init__(self, name, model, columns, default_fields=None, order=('id',), criteria=None):
+        self.name = name
+        self.model = model
+        self.columns = {column: getattr(model, column) for column in columns}
+        self.default_fields = [field for field in (default_fields or columns) if field != 'id']
+        self.order = list(order)
+        self.criteria = criteria or (lambda: [])
+        self.includes = {}
+
+    def include(self, name, resource, key, parent_key, many=True, limit=None):
+        """
+        Allow include=name: rows of resource whose key column equals this
+        resource's parent_key column; a list if many, else one row or null.
+        """
+        self.includes[name] = Include(resource, key, parent_key, many, limit)
+        return self
+
+
+def unique(names):
+    return list(dict.fromkeys(names))
+
+
+def serialize(value):
+    return value.isoformat() if isinstance(value, datetime) else value
+
+
+def project(row, fields):
+    return {field: serialize(row[field]) for field in ['id'] + fields}
+
+
+def requested_fields(resource, value):
+    if value is None:
+        return resource.default_fields
+    fields = [field for field in value.split(',') if field]
+    for field in fields:
+        if field not in resource.columns:
+            raise ApiError(400, 'unknown field {!r} for {}'.format(field, resource.name))
+    return unique(field for field in fields if field != 'id')
+
+
+def requested_limit(value, default, maximum):
+    if value is None:
+        return default
+    try:
+        limit = int(value)
+    except ValueError:
+        limit = 0
+    if not 0 < limit <= maximum:
+        raise ApiError(400, 'limit must be between 1 and {}'.format(maximum))
+    return limit
+
+
+def encode_cursor(values):
+    raw = json.dumps([serialize(value) for value in values])
+    return base64.urlsafe_b64encode(raw.encode('utf-8')).decode('ascii').rstrip('=')
+
+
+def cursor_value(column, value):
+    # A decoded cursor value, checked against the column's type so a
+    # tampered cursor is a 400 rather than a database error.
+    if value is None:
+        return None
+    if isinstance(column.type, DateTime):
+        return datetime.fromisoformat(value)
+    python_type = column.type.python_type
+    if isinstance(value, bool) is not (python_type is bool) or not isinstance(value, python_type):
+        raise ValueError(value)
+    return value
+
+
+def decode_cursor(resource, cursor):
+    try:
+        values = json.loads(base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4)))
+        if not isinstance(values, list) or len(values) != len(resource.order):
+            raise ValueError(cursor)
+        return [cursor_value(resource.columns[name], value) for name, value in zip(resource.order, values)]
+    except (ValueError, TypeError, binascii.Error):
+        raise ApiError(400, 'invalid cursor')
+
+
+def after_cursor(resource, values):
+    # (a, b) > (x, y) spelled out as a > x OR (a = x AND b > y).
+    columns = [resource.columns[name] for name in resource.order]
+    return or_(*[
+        and_(*[columns[j] == values[j] for j in range(i)] + [columns[i] > values[i]])
+        for i in range(len(columns))
+    ])
+
+
+class Api(object):
+
+    def __init__(self, db, page_size=20, max_page_size=100):
+        self.db = db
+        self.page_size = page_size
+        self.max_page_size = max_page_size
+
+    def fetch(self, resource, criteria, limit, args):
+        """
+        Up to limit rows of resource matching criteria, as dicts of the
+        requested fields and includes, and the order key of each row.
+        """
+        fields = requested_fields(resource, args.get('fields'))
+        includes = unique(name for name in args.get('include', '').split(',') if name)
+        for name in includes:
+            if name not in resource.includes:
+                raise ApiError(400, 'unknown include {!r} for {}'.format(name, resource.name))
+        selected = unique(
+            ['id'] + fields + resource.order + [resource.includes[name].parent_key for name in includes]
+        )
+        rows = [row._asdict() for row in self.db.session.query(
+            *[resource.columns[name].label(name) for name in selected]
+        ).filter(
+            *resource.criteria() + criteria
+        ).order_by(
+            *[resource.columns[name] for name in resource.order]
+        ).limit(limit)]
+        for name in includes:
+            self.attach(name, resource.includes[name], rows, args)
+        return (
+            [dict(project(row, fields), **{name: row[name] for name in includes}) for row in rows],
+            [[row[name] for name in resource.order] for row in rows]
+        )
+
+    def attach(self, name, include, rows, args):
+        child = include.resource
+        fields = requested_fields(child, args.get('fields[{}]'.format(name)))
+        keys = {row[include.parent_key] for row in rows} - {None}
+        found = {}
+        if keys:
+            selected = unique(['id'] + fields + child.order + [include.key])
+            key = child.columns[include.key]
+            columns = [child.columns[column].label(column) for column in selected]
+            order = [child.columns[column] for column in child.order]
+            criteria = child.criteria() + [key.in_(keys)]
+            limit = include.many and requested_limit(
+                args.get('limit[{}]'.format(name)), include.limit, self.max_page_size
+            )
+            if limit:
+                # The first `limit` children of every parent, in one query.
+                rank = func.row_number().over(partition_by=key, order_by=order).label('rank_')
+                ranked = self.db.session.query(*columns + [rank]).filter(*criteria).subquery()
+                query = self.db.session.query(
+                    *[ranked.c[column] for column in selected]
+                ).filter(
+                    ranked.c.rank_ <= limit
+                ).order_by(*[ranked.c[column] for column in child.order])
+            else:
+                query = self.db.session.query(*columns).filter(*criteria).order_by(*order)
+            for row in query:
+                row = row._asdict()
+                if include.many:
+                    found.setdefault(row[include.key], []).append(project(row, fields))
+                else:
+                    found[row[include.key]] = project(row, fields)
+        for row in rows:
+            related = found.get(row[include.parent_key])
+            row[name] = (related or []) if include.many else related
+
+    def collection(self, resource):
+        limit = requested_limit(request.args.get('limit'), self.page_size, self.max_page_size)
+        criteria = []
+        cursor = request.args.get('cursor')
+        if cursor:
+            criteria.append(after_cursor(resource, decode_cursor(resource, cursor)))
+        # One extra row tells us whether there is a next page.
+        rows, keys = self.fetch(resource, criteria, limit + 1, request.args)
+        next_cursor = encode_cursor(keys[limit - 1]) if len(rows) > limit else None
+        return jsonify({"data": rows[:limit], "next_cursor": next_cursor})
+
+    def item(self, resource, item_id):
+        rows, keys = self.fetch(resource, [resource.columns['id'] == item_id], 1, request.args)
+        if not rows:
+            raise ApiError(404, '{} {} not found'.format(resource.name, item_id))
+        return jsonify({"data": rows[0]})
+
+    def blueprint(self, resources, name='api_v1', url_prefix='/api/v1', decorators=()):
+        """
+        A blueprint serving resources; endpoints are <name>.<resource>_list
+        and <name>.<resource>_detail, wrapped in decorators (innermost last).
+        """
+        blueprint = Blueprint(name, __name__, url_prefix=url_prefix)
+
+        def view(function, resource):
+            def wrapper(**kwargs):
+                return function(resource, **kwargs)
+            for decorator in reversed(decorators):
+                wrapper = decorator(wrapper)
+            return wrapper
+
+        for resource in resources:
+            blueprint.add_url_rule(
+                '/' + resource.name, resource.name + '_list', view(self.collection, resource)
+            )
+            blueprint.add_url_rule(
+                '/{}/<int:item_id>'.format(resource.name), resource.name + '_detail', view(self.item, resource)
+            )
+
+        @blueprint.errorhandler(ApiError)
+        def api_error(error):
+            return jsonify({"error": error.message}), error.status
+
+        return blueprint
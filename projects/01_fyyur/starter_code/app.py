@@ -2,19 +2,37 @@
 # Imports
 #----------------------------------------------------------------------------#
 
+import functools
+import hashlib
 import json
-import sys
+import time
+from datetime import datetime, timedelta, timezone
 
+import click
 import dateutil.parser
 import babel
-from flask import Flask, render_template, request, Response, flash, redirect, url_for, jsonify
+import babel.dates
+from flask import (
+    Flask, render_template, request, Response, flash, redirect, url_for, jsonify,
+    abort, stream_with_context, make_response, session, g, has_request_context
+)
 from flask_moment import Moment
-from flask_sqlalchemy import SQLAlchemy
 from flask_migrate import Migrate
-import logging
-from logging import Formatter, FileHandler
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
 from flask_wtf import Form
 from forms import *
+from search import install_search_ddl, search_table
+from typeahead import PrefixIndex
+from importer import BulkImporter, FormValidator, ForeignKeyResolver, ShowValidator
+from fragment_cache import FragmentCache
+from booking import BatchBookingValidator, find_conflicts
+from archiver import archive_with_shows
+from db_routing import RoutingSQLAlchemy, TimedQueuePool, pool_status
+from request_logging import init_logging
+from metrics import RequestMetrics
+from api import Api, Resource
+from markupsafe import Markup
 #----------------------------------------------------------------------------#
 # App Config.
 #----------------------------------------------------------------------------#
@@ -22,7 +40,10 @@ from forms import *
 app = Flask(__name__)
 moment = Moment(app)
 app.config.from_object('config')
-db = SQLAlchemy(app)
+if 'pool_size' in app.config['SQLALCHEMY_ENGINE_OPTIONS']:
+    app.config['SQLALCHEMY_ENGINE_OPTIONS'].setdefault('poolclass', TimedQueuePool)
+db = RoutingSQLAlchemy(app)
+metrics = RequestMetrics(app)
 
 migrate = Migrate(app, db)
 
@@ -31,6 +52,10 @@ migrate = Migrate(app, db)
 # Models.
 #----------------------------------------------------------------------------#
 
+# PostgreSQL stores genres as an indexed varchar[]; SQLite (local
+# development) keeps the same list as JSON text.
+Genres = db.ARRAY(db.String(120)).with_variant(db.JSON(), 'sqlite')
+
 
 class Venue(db.Model):
     __tablename__ = 'Venue'
@@ -41,9 +66,17 @@ class Venue(db.Model):
     state = db.Column(db.String(120))
     address = db.Column(db.String(120))
     phone = db.Column(db.String(120))
-    genres = db.Column(db.String(120))
+    genres = db.Column(Genres)
     image_link = db.Column(db.String(500))
     facebook_link = db.Column(db.String(120))
+    archived_at = db.Column(db.DateTime)
+    # Bumped by every edit; see update_versioned().
+    version = db.Column(db.Integer, nullable=False, default=1, server_default='1')
+
+    __table_args__ = (
+        db.Index('ix_Venue_city_state', 'city', 'state'),
+    )
+    __mapper_args__ = {'version_id_col': version}
 
 
 class Artist(db.Model):
@@ -54,9 +87,14 @@ class Artist(db.Model):
     city = db.Column(db.String(120))
     state = db.Column(db.String(120))
     phone = db.Column(db.String(120))
-    genres = db.Column(db.String(120))
+    genres = db.Column(Genres)
     image_link = db.Column(db.String(500))
     facebook_link = db.Column(db.String(120))
+    archived_at = db.Column(db.DateTime)
+    # Bumped by every edit; see update_versioned().
+    version = db.Column(db.Integer, nullable=False, default=1, server_default='1')
+
+    __mapper_args__ = {'version_id_col': version}
 
 
 class Show(db.Model):
@@ -64,26 +102,647 @@ class Show(db.Model):
 
     id = db.Column(db.Integer, primary_key=True)
     artist_id = db.Column(db.Integer, db.ForeignKey('Artist.id'), nullable=False)
-    artist = db.relationship('Artist', backref=db.backref('shows', cascade='all, delete'))
+    # Shows are archived or deleted in batches by archive_with_shows(), never
+    # loaded into the session to cascade a parent delete.
+    artist = db.relationship('Artist', backref=db.backref('shows', lazy='dynamic', passive_deletes=True))
     venue_id = db.Column(db.Integer, db.ForeignKey('Venue.id'), nullable=False)
-    venue = db.relationship('Venue', backref=db.backref('shows', cascade='all, delete'))
+    venue = db.relationship('Venue', backref=db.backref('shows', lazy='dynamic', passive_deletes=True))
     start_time = db.Column(db.DateTime())
+    archived_at = db.Column(db.DateTime)
+
+    __table_args__ = (
+        db.Index('ix_Show_venue_id_start_time', 'venue_id', 'start_time'),
+        db.Index('ix_Show_artist_id_start_time', 'artist_id', 'start_time'),
+        db.Index('ix_Show_start_time_id', 'start_time', 'id'),
+    )
+
+
+class TableRevision(db.Model):
+    # One row per table, bumped by every commit that writes to it.
+    __tablename__ = 'TableRevision'
+
+    table_name = db.Column(db.String(64), primary_key=True)
+    revision = db.Column(db.Integer, nullable=False, default=0)
+    updated_at = db.Column(db.DateTime, nullable=False)
+
+
+for table in (Venue.__table__, Artist.__table__):
+    install_search_ddl(table)
+    event.listen(table, 'after_create', db.DDL(
+        'CREATE INDEX "ix_{0}_genres" ON "{0}" USING gin (genres)'.format(table.name)
+    ).execute_if(dialect='postgresql'))
+
+
+#----------------------------------------------------------------------------#
+# Revisions.
+#----------------------------------------------------------------------------#
+
+@event.listens_for(Engine, 'before_cursor_execute')
+def record_written_table(conn, cursor, statement, parameters, context, executemany):
+    # Catches ORM flushes and Core insert/update/delete alike.
+    if context is None or context.compiled is None:
+        return
+    if context.isinsert or context.isupdate or context.isdelete:
+        table = context.compiled.statement.table.name
+        if table != TableRevision.__tablename__:
+            conn.info.setdefault('written_tables', set()).add(table)
+
+
+@event.listens_for(Engine, 'commit')
+@event.listens_for(Engine, 'rollback')
+def forget_written_tables(conn):
+    conn.info.pop('written_tables', None)
+
+
+@event.listens_for(db.session, 'before_commit')
+def bump_table_revisions(session):
+    session.flush()
+    written = session.connection().info.pop('written_tables', None)
+    if written:
+        touch_tables(session, written)
+
+
+def touch_tables(session, tables):
+    now = datetime.utcnow()
+    revisions = TableRevision.__table__
+    # Fixed order so concurrent commits lock the rows the same way round.
+    for table in sorted(tables):
+        updated = session.execute(
+            revisions.update().where(revisions.c.table_name == table).values(
+                revision=revisions.c.revision + 1, updated_at=now
+            )
+        ).rowcount
+        if not updated:
+            session.execute(revisions.insert().values(table_name=table, revision=1, updated_at=now))
+
+
+def table_revisions(names):
+    revisions = TableRevision.__table__
+    rows = db.session.execute(
+        db.select([revisions.c.table_name, revisions.c.revision, revisions.c.updated_at])
+        .where(revisions.c.table_name.in_(names))
+    )
+    return {table_name: (revision, updated_at) for table_name, revision, updated_at in rows}
+
+
+def conditional(*models, changed_at=None):
+    # Answer conditional GETs from table revisions alone. The ETag hashes
+    # the request path with the revisions of every table the page reads, so
+    # a matching If-None-Match gets its 304 before the view queries or
+    # renders anything. Pages that also change as time passes (past and
+    # upcoming shows) pass changed_at, called with the view's arguments for
+    # the last time that happened, which joins the ETag and Last-Modified.
+    names = sorted(model.__tablename__ for model in models)
+
+    def decorator(view):
+        @functools.wraps(view)
+        def wrapper(*args, **kwargs):
+            if session.get('_flashes'):
+                return view(*args, **kwargs)
+            revisions = table_revisions(names)
+            moment = changed_at(**kwargs) if changed_at is not None else None
+            etag = hashlib.sha1(repr((
+                request.full_path, [(name, revisions.get(name, (0, None))[0]) for name in names], moment
+            )).encode('utf-8')).hexdigest()
+            modified = [updated_at for revision, updated_at in revisions.values()]
+            if moment is not None:
+                # show times are local, revision times UTC
+                modified.append(moment.astimezone(timezone.utc).replace(tzinfo=None))
+            last_modified = max(modified).replace(microsecond=0) if modified else None
+
+            if request.if_none_match:
+                not_modified = request.if_none_match.contains(etag)
+            else:
+                since = request.if_modified_since
+                if since is not None and since.tzinfo is not None:
+                    since = since.astimezone(timezone.utc).replace(tzinfo=None)
+                not_modified = bool(since and last_modified and last_modified <= since)
+
+            response = Response(status=304) if not_modified else make_response(view(*args, **kwargs))
+            if response.status_code in (200, 304):
+                response.set_etag(etag)
+                if last_modified is not None:
+                    response.last_modified = last_modified
+            return response
+        return wrapper
+    return decorator
+
+
+def last_show_started(owner_id_column, argument):
+    # changed_at for conditional(): the page's latest show to start, when it
+    # moved from the upcoming to the past shows.
+    def changed_at(**kwargs):
+        return db.session.query(db.func.max(Show.start_time)).filter(
+            owner_id_column == kwargs[argument],
+            Show.start_time <= datetime.now(),
+            Show.archived_at.is_(None)
+        ).scalar()
+    return changed_at
+
+
+#----------------------------------------------------------------------------#
+# Read routing.
+#----------------------------------------------------------------------------#
+
+@event.listens_for(db.session, 'after_commit')
+def pin_reads_to_primary(db_session):
+    # The browser that wrote reads from the primary for a few seconds, so
+    # replication lag cannot hide its own change from it.
+    if has_request_context() and app.config['SQLALCHEMY_BINDS']:
+        session['primary_until'] = time.time() + app.config['REPLICA_STICKY_SECONDS']
+
+
+def read_replica(view):
+    # Send the view's queries to the replica bind, when one is configured.
+    @functools.wraps(view)
+    def wrapper(*args, **kwargs):
+        g.read_replica = session.get('primary_until', 0) < time.time()
+        return view(*args, **kwargs)
+    return wrapper
 
 
 #----------------------------------------------------------------------------#
 # Filters.
 #----------------------------------------------------------------------------#
 
-def format_datetime(value, format='medium'):
-    date = dateutil.parser.parse(str(value))
-    if format == 'full':
-        format="EEEE MMMM, d, y 'at' h:mma"
-    elif format == 'medium':
-        format="EE MM, dd, y h:mma"
-    return babel.dates.format_datetime(date, format)
+DATETIME_FORMATS = {
+    'full': "EEEE MMMM, d, y 'at' h:mma",
+    'medium': "EE MM, dd, y h:mma",
+}
+
+
+@functools.lru_cache(maxsize=64)
+def compiled_datetime_format(format, locale):
+    # Parsing the Babel pattern and loading the locale data are the expensive
+    # parts of formatting, so do them once per format/locale pair.
+    pattern = DATETIME_FORMATS.get(format, format)
+    return babel.dates.parse_pattern(pattern), babel.Locale.parse(locale)
+
+
+def format_datetime(value, format='medium', locale=None):
+    if not isinstance(value, datetime):
+        value = dateutil.parser.parse(str(value))
+    if format in ('long', 'short'):
+        return babel.dates.format_datetime(value, format, locale=locale or babel.dates.LC_TIME)
+    if value.tzinfo is None:
+        value = value.replace(tzinfo=babel.dates.UTC)
+    pattern, locale = compiled_datetime_format(format, locale or babel.dates.LC_TIME)
+    return pattern.apply(value, locale)
 
 app.jinja_env.filters['datetime'] = format_datetime
 
+#----------------------------------------------------------------------------#
+# Queries.
+#----------------------------------------------------------------------------#
+
+# Shows have no end time; each one is taken to hold its venue and artist
+# for this long when checking for double bookings.
+SHOW_DURATION = timedelta(minutes=app.config['SHOW_DURATION_MINUTES'])
+
+
+def genre_filter(column, genre):
+    # On PostgreSQL "genres @> ARRAY[genre]" is answered by the GIN index.
+    if db.engine.dialect.name == 'postgresql':
+        return column.contains([genre])
+    return db.cast(column, db.Text).like('%{}%'.format(json.dumps(genre)))
+
+
+def venue_areas(genre=None):
+    # Every venue with its upcoming show count, fetched in one grouped query
+    # and bucketed by city/state in a single pass over the sorted rows.
+    num_upcoming_shows = db.func.count(Show.id)
+    rows = db.session.query(
+        Venue.id, Venue.name, Venue.city, Venue.state, num_upcoming_shows
+    ).outerjoin(
+        Show, db.and_(
+            Show.venue_id == Venue.id, Show.start_time > datetime.now(), Show.archived_at.is_(None)
+        )
+    ).filter(
+        Venue.archived_at.is_(None)
+    )
+    if genre:
+        rows = rows.filter(genre_filter(Venue.genres, genre))
+    rows = rows.group_by(
+        Venue.id
+    ).order_by(
+        Venue.state, Venue.city, Venue.name, Venue.id
+    )
+
+    areas = []
+    for venue_id, name, city, state, upcoming in rows:
+        if not areas or areas[-1]['city'] != city or areas[-1]['state'] != state:
+            areas.append({"city": city, "state": state, "venues": []})
+        areas[-1]['venues'].append({
+            "id": venue_id,
+            "name": name,
+            "num_upcoming_shows": upcoming
+        })
+    return areas
+
+
+def show_partitions(owner_id_column, owner_id, other, other_id_column, prefix, limit):
+    # Split an owner's shows around now() in SQL: both counts come from one
+    # aggregate and each side is a bounded slice read off the
+    # (owner_id, start_time) index, so the cost does not grow with history.
+    now = datetime.now()
+    upcoming_count, past_count = db.session.query(
+        db.func.count(db.case([(Show.start_time > now, 1)])),
+        db.func.count(db.case([(Show.start_time <= now, 1)]))
+    ).filter(owner_id_column == owner_id, Show.archived_at.is_(None)).one()
+
+    def shows(count, condition, order):
+        if not count:
+            return []
+        rows = db.session.query(
+            other.id, other.name, other.image_link, Show.start_time
+        ).join(
+            other, other_id_column == other.id
+        ).filter(
+            owner_id_column == owner_id, Show.archived_at.is_(None), condition
+        ).order_by(order).limit(limit)
+        return [{
+            prefix + "_id": other_id,
+            prefix + "_name": name,
+            prefix + "_image_link": image_link,
+            "start_time": start_time
+        } for other_id, name, image_link, start_time in rows]
+
+    return {
+        "upcoming_shows": shows(upcoming_count, Show.start_time > now, Show.start_time.asc()),
+        "upcoming_shows_count": upcoming_count,
+        "past_shows": shows(past_count, Show.start_time <= now, Show.start_time.desc()),
+        "past_shows_count": past_count
+    }
+
+
+def venue_detail(venue_id):
+    venue = Venue.query.get(venue_id)
+    if venue is None or venue.archived_at is not None:
+        abort(404)
+    data = {column.name: getattr(venue, column.name) for column in Venue.__table__.columns}
+    data.update(show_partitions(
+        Show.venue_id, venue_id, Artist, Show.artist_id, 'artist',
+        app.config['DETAIL_SHOWS_LIMIT']
+    ))
+    return data
+
+
+def artist_detail(artist_id):
+    artist = Artist.query.get(artist_id)
+    if artist is None or artist.archived_at is not None:
+        abort(404)
+    data = {column.name: getattr(artist, column.name) for column in Artist.__table__.columns}
+    data.update(show_partitions(
+        Show.artist_id, artist_id, Venue, Show.venue_id, 'venue',
+        app.config['DETAIL_SHOWS_LIMIT']
+    ))
+    return data
+
+
+def editable_values(model, form):
+    # Values of the form fields that were actually submitted and map to a
+    # column of model, so a partial POST leaves the other columns alone.
+    skip = ('id', 'version', 'archived_at')
+    return {
+        column.name: form[column.name].data
+        for column in model.__table__.columns
+        if column.name not in skip and column.name in form and column.name in request.form
+    }
+
+
+def update_versioned(model, item_id, version, values):
+    # Reads the row's current values, then one UPDATE ... WHERE id AND
+    # version writing only the columns whose value differs, so a save
+    # leaves untouched fields (and their concurrent edits) alone. Returns
+    # the outcome, 'updated', 'unchanged', 'conflict' (edited since version
+    # was read) or 'missing' (no such row, or archived), and the changed
+    # values.
+    table = model.__table__
+    current = db.session.execute(
+        db.select([table.c.version] + [table.c[name] for name in values]).where(
+            table.c.id == item_id
+        ).where(
+            table.c.archived_at.is_(None)
+        )
+    ).first()
+    if current is None:
+        db.session.rollback()
+        return 'missing', {}
+    if current.version != version:
+        db.session.rollback()
+        return 'conflict', {}
+    stored = dict(zip(values, current[1:]))
+    changed = {name: value for name, value in values.items() if stored[name] != value}
+    if not changed:
+        db.session.rollback()
+        return 'unchanged', {}
+    updated = db.session.execute(
+        table.update().where(
+            table.c.id == item_id
+        ).where(
+            table.c.version == version
+        ).where(
+            table.c.archived_at.is_(None)
+        ).values(version=table.c.version + 1, **changed)
+    ).rowcount
+    db.session.commit()
+    if updated:
+        return 'updated', changed
+    exists = db.session.query(model.id).filter_by(id=item_id, archived_at=None).scalar()
+    return ('conflict' if exists is not None else 'missing'), {}
+
+
+def encode_show_cursor(start_time, show_id):
+    return '{}_{}'.format(start_time.isoformat(), show_id)
+
+
+def decode_show_cursor(cursor):
+    start_time, show_id = cursor.rsplit('_', 1)
+    return datetime.fromisoformat(start_time), int(show_id)
+
+
+class ShowListing(object):
+    # One keyset page of shows ordered by (start_time, id). Rows are streamed
+    # from a single joined query as the template iterates; next_cursor is set
+    # once the page has been consumed.
+
+    def __init__(self, after=None, limit=60):
+        self.after = after
+        self.limit = limit
+        self.next_cursor = None
+        self.venue_ids = set()
+        self.artist_ids = set()
+
+    def query(self):
+        query = db.session.query(
+            Show.id, Show.start_time,
+            Show.venue_id, Venue.name,
+            Show.artist_id, Artist.name, Artist.image_link
+        ).join(
+            Venue, Show.venue_id == Venue.id
+        ).join(
+            Artist, Show.artist_id == Artist.id
+        ).filter(
+            Show.start_time.isnot(None),
+            Show.archived_at.is_(None),
+            Venue.archived_at.is_(None),
+            Artist.archived_at.is_(None)
+        )
+        if self.after is not None:
+            start_time, show_id = self.after
+            query = query.filter(db.or_(
+                Show.start_time > start_time,
+                db.and_(Show.start_time == start_time, Show.id > show_id)
+            ))
+        # One extra row tells us whether there is a next page.
+        return query.order_by(Show.start_time, Show.id).limit(self.limit + 1).yield_per(100)
+
+    def __iter__(self):
+        last = None
+        for count, row in enumerate(self.query()):
+            if count == self.limit:
+                self.next_cursor = encode_show_cursor(last[1], last[0])
+                continue
+            last = row
+            show_id, start_time, venue_id, venue_name, artist_id, artist_name, artist_image_link = row
+            self.venue_ids.add(venue_id)
+            self.artist_ids.add(artist_id)
+            yield {
+                "venue_id": venue_id,
+                "venue_name": venue_name,
+                "artist_id": artist_id,
+                "artist_name": artist_name,
+                "artist_image_link": artist_image_link,
+                "start_time": start_time
+            }
+
+
+venue_names = PrefixIndex(
+    max_entries=app.config['TYPEAHEAD_MAX_ENTRIES'],
+    refresh_seconds=app.config['TYPEAHEAD_REFRESH_SECONDS']
+)
+artist_names = PrefixIndex(
+    max_entries=app.config['TYPEAHEAD_MAX_ENTRIES'],
+    refresh_seconds=app.config['TYPEAHEAD_REFRESH_SECONDS']
+)
+
+
+def active_names(model):
+    return db.session.query(model.id, model.name).filter(
+        model.archived_at.is_(None)
+    ).order_by(model.id)
+
+
+def name_index(index, model):
+    # Built on first use and refreshed periodically so writes handled by
+    # other processes are picked up; one request rebuilds while the others
+    # search the previous index.
+    index.refresh(lambda: active_names(model))
+    return index
+
+
+def stream_template(template_name, **context):
+    # Render a template incrementally so large listings are sent while the
+    # database is still producing rows.
+    app.update_template_context(context)
+    template = app.jinja_env.get_template(template_name)
+    stream = template.stream(context)
+    stream.enable_buffering(5)
+    return Response(stream_with_context(stream))
+
+#----------------------------------------------------------------------------#
+# Fragments.
+#----------------------------------------------------------------------------#
+
+# Rendered blocks of the listing pages. Tags used for invalidation:
+#   'venue-areas'          list of (city, state) on /venues
+#   ('area', city, state)  one area block on /venues
+#   'artist-blocks'        number of artist blocks on /artists
+#   ('artists', n)         artists with id // ARTIST_BLOCK_SIZE == n
+#   'shows'                every /shows page
+#   ('venue', id), ('artist', id)  /shows pages naming that venue/artist, and
+#                          the /venues area block listing that venue
+fragment_cache = FragmentCache(
+    max_bytes=app.config['FRAGMENT_CACHE_MAX_BYTES'],
+    ttl=app.config['FRAGMENT_CACHE_TTL']
+)
+# NDJSON bodies for the named calendar windows; the short TTL also moves
+# "tonight" forward as time passes.
+calendar_cache = FragmentCache(
+    max_bytes=app.config['CALENDAR_CACHE_MAX_BYTES'],
+    ttl=app.config['CALENDAR_CACHE_TTL']
+)
+
+
+def render_fragment(template_name, **context):
+    return Markup(render_template(template_name, **context))
+
+
+def generate_fragment(template_name, **context):
+    app.update_template_context(context)
+    return app.jinja_env.get_template(template_name).generate(context)
+
+
+def area_key(city, state):
+    return ('area', city, state)
+
+
+def artist_block_key(artist_id):
+    return ('artists', artist_id // app.config['ARTIST_BLOCK_SIZE'])
+
+
+def calendar_window(name, now):
+    # Named windows partners ask for most; these are the cached ones.
+    if name == 'tonight':
+        end = now.replace(hour=6, minute=0, second=0, microsecond=0)
+        return now, end if end > now else end + timedelta(days=1)
+    if name == 'weekend':
+        # Friday 18:00 to Monday 00:00, the current weekend once it started.
+        monday = (now + timedelta(days=7 - now.weekday())).replace(
+            hour=0, minute=0, second=0, microsecond=0
+        )
+        return max(now, monday - timedelta(hours=54)), monday
+    return None
+
+
+def calendar_lines(city, state, start, end):
+    # Shows in [start, end) at venues in city/state, one JSON line each.
+    # The venue (city, state) and Show (venue_id, start_time) indexes keep
+    # this a pair of index range scans however large the tables get.
+    query = db.session.query(
+        Show.id, Show.start_time,
+        Venue.id, Venue.name, Venue.city, Venue.state,
+        Artist.id, Artist.name, Artist.image_link
+    ).join(
+        Venue, Show.venue_id == Venue.id
+    ).join(
+        Artist, Show.artist_id == Artist.id
+    ).filter(
+        Venue.city == city, Show.start_time >= start, Show.start_time < end,
+        Show.archived_at.is_(None), Venue.archived_at.is_(None), Artist.archived_at.is_(None)
+    )
+    if state:
+        query = query.filter(Venue.state == state)
+    query = query.order_by(Show.start_time, Show.id).yield_per(500)
+    for show_id, start_time, venue_id, venue_name, venue_city, venue_state, \
+            artist_id, artist_name, artist_image_link in query:
+        yield json.dumps({
+            "show_id": show_id,
+            "start_time": start_time.isoformat(),
+            "venue_id": venue_id,
+            "venue_name": venue_name,
+            "city": venue_city,
+            "state": venue_state,
+            "artist_id": artist_id,
+            "artist_name": artist_name,
+            "artist_image_link": artist_image_link
+        }) + '\n'
+
+
+def venue_area_fragments():
+    locations = fragment_cache.get('venue-areas')
+    if locations is not None:
+        fragments = [fragment_cache.get(area_key(city, state)) for city, state in locations]
+        if None not in fragments:
+            return fragments
+    # Something is missing: one grouped query refills every missing area.
+    areas = venue_areas()
+    fragment_cache.set('venue-areas', [(area['city'], area['state']) for area in areas])
+    fragments = []
+    for area in areas:
+        key = area_key(area['city'], area['state'])
+        html = fragment_cache.get(key)
+        if html is None:
+            # Tagged with its venues, so an edit that moves a venue out of
+            # the area can invalidate it without knowing the old location.
+            html = fragment_cache.set(
+                key, render_fragment('fragments/venue_area.html', area=area),
+                tags=[('venue', venue['id']) for venue in area['venues']]
+            )
+        fragments.append(html)
+    return fragments
+
+
+def artist_block_fragments():
+    block_size = app.config['ARTIST_BLOCK_SIZE']
+    blocks = fragment_cache.get('artist-blocks')
+    if blocks is None:
+        max_id = db.session.query(db.func.max(Artist.id)).scalar()
+        blocks = fragment_cache.set('artist-blocks', max_id // block_size + 1 if max_id else 0)
+
+    fragments = [fragment_cache.get(('artists', block)) for block in range(blocks)]
+    missing = [block for block, html in enumerate(fragments) if html is None]
+    if missing:
+        # A single range query covers every missing block.
+        rows = db.session.query(Artist.id, Artist.name).filter(
+            Artist.id >= missing[0] * block_size,
+            Artist.id < (missing[-1] + 1) * block_size,
+            Artist.archived_at.is_(None)
+        ).order_by(Artist.id)
+        by_block = {block: [] for block in missing}
+        for artist_id, name in rows:
+            if artist_id // block_size in by_block:
+                by_block[artist_id // block_size].append({"id": artist_id, "name": name})
+        for block, artists in by_block.items():
+            fragments[block] = fragment_cache.set(
+                ('artists', block), render_fragment('fragments/artist_block.html', artists=artists)
+            )
+    return fragments
+
+
+def show_page_fragments(after, limit):
+    key = ('shows', after, limit)
+    html = fragment_cache.get(key)
+    if html is not None:
+        return [html]
+    listing = ShowListing(after=after, limit=limit)
+    return fragment_cache.capture(
+        key,
+        generate_fragment('fragments/show_tiles.html', shows=listing),
+        tags=lambda: ['shows'] +
+        [('venue', venue_id) for venue_id in listing.venue_ids] +
+        [('artist', artist_id) for artist_id in listing.artist_ids]
+    )
+
+def archive_listing(model, item_id, delete_shows=False, batch_size=None):
+    # Archive a venue or artist and archive (or delete) its shows in
+    # batches; yields progress stats. The caches and the autocomplete index
+    # forget it as soon as the row itself is archived, and the show caches
+    # are dropped again once every batch is done.
+    item = db.session.query(model.city, model.state).filter(model.id == item_id).first()
+    if item is None:
+        return
+    if model is Venue:
+        column, index = 'venue_id', venue_names
+        tags = ['venue-areas', area_key(item.city, item.state), ('venue', item_id)]
+    else:
+        column, index = 'artist_id', artist_names
+        tags = [artist_block_key(item_id), ('artist', item_id)]
+    steps = archive_with_shows(
+        db.session, model.__table__, Show.__table__, column, item_id,
+        delete_shows=delete_shows, batch_size=batch_size or app.config['ARCHIVE_BATCH_SIZE']
+    )
+    for stats in steps:
+        if stats['batches'] == 0:
+            index.remove(item_id)
+            fragment_cache.invalidate('shows', *tags)
+            calendar_cache.invalidate('shows', 'venues', 'artists')
+        yield stats
+    fragment_cache.invalidate('shows')
+    calendar_cache.invalidate('shows')
+
+
+def stream_archive(model, item_id):
+    # DELETE handler body: NDJSON progress lines, ending with the totals.
+    if db.session.query(model.id).filter(model.id == item_id).scalar() is None:
+        abort(404)
+    delete_shows = request.args.get('shows') == 'delete'
+
+    def lines():
+        for stats in archive_listing(model, item_id, delete_shows):
+            yield json.dumps(stats) + '\n'
+    return Response(stream_with_context(lines()), mimetype='application/x-ndjson')
+
 #----------------------------------------------------------------------------#
 # Controllers.
 #----------------------------------------------------------------------------#
@@ -97,29 +756,31 @@ def index():
 #  ----------------------------------------------------------------
 
 @app.route('/venues')
+@read_replica
+@conditional(Venue)
 def venues():
-    unique_venue_locations = Venue.query.distinct(Venue.city, Venue.state).all()
-    data = [
-        {
-            "city": loc.city,
-            "state": loc.state,
-            "venues": Venue.query.filter(Venue.city == loc.city and Venue.state == loc.state)
-        } for loc in unique_venue_locations
-    ]
-
-    return render_template('pages/venues.html', areas=data)
+    genre = request.args.get('genre')
+    if genre:
+        # Filtered listings are not cached; the genre index keeps them cheap.
+        areas = [render_fragment('fragments/venue_area.html', area=area) for area in venue_areas(genre)]
+    else:
+        areas = venue_area_fragments()
+    return render_template('pages/venues.html', areas=areas)
 
 
 @app.route('/venues/search', methods=['POST'])
+@read_replica
 def search_venues():
     # seach for Hop should return "The Musical Hop".
     # search for "Music" should return "The Musical Hop" and "Park Square Live Music & Coffee"
-    search_term = request.form.get('search_term')
-    venues = Venue.query.filter(Venue.name.ilike("%{}%".format(search_term))).all()
+    search_term = request.form.get('search_term', '')
+    venues = search_table(
+        db.session, Venue.__table__, search_term, app.config['SEARCH_RESULTS_LIMIT']
+    )
 
     response = {
         "count": len(venues),
-        "data": [v for v in venues]
+        "data": venues
     }
     return render_template(
         'pages/search_venues.html',
@@ -128,10 +789,21 @@ def search_venues():
     )
 
 
+@app.route('/venues/autocomplete')
+@read_replica
+def autocomplete_venues():
+    limit = max(1, min(request.args.get('limit', 10, type=int), 50))
+    return jsonify({
+        "data": name_index(venue_names, Venue).search(request.args.get('q', ''), limit)
+    })
+
+
 @app.route('/venues/<int:venue_id>')
+@read_replica
+@conditional(Venue, Show, Artist, changed_at=last_show_started(Show.venue_id, 'venue_id'))
 def show_venue(venue_id):
     # shows the venue page with the given venue_id
-    return render_template('pages/show_venue.html', venue=Venue.query.get(venue_id))
+    return render_template('pages/show_venue.html', venue=venue_detail(venue_id))
 
 #  Create Venue
 #  ----------------------------------------------------------------
@@ -159,10 +831,12 @@ def create_venue_submission():
         )
         db.session.add(venue)
         db.session.commit()
+        venue_names.add(venue.id, venue.name)
+        fragment_cache.invalidate('venue-areas', area_key(venue.city, venue.state))
     except:
         error = True
         db.session.rollback()
-        print(sys.exc_info())
+        app.logger.exception('Could not create venue')
     finally:
         db.session.close()
     if error:
@@ -175,37 +849,42 @@ def create_venue_submission():
     return render_template('pages/home.html')
 
 
-@app.route('/venues/<venue_id>', methods=['DELETE'])
+@app.route('/venues/<int:venue_id>', methods=['DELETE'])
 def delete_venue(venue_id):
-    # SQLAlchemy ORM to delete a record. Handle cases where the session commit could fail.
-    try:
-        venue_to_delete = Venue.query.filter(Venue.id == venue_id).one()
-        venue_to_delete.delete()
-        flash("Venue " + venue_to_delete[0]['name'] + " was successfully deleted!")
-    except:
-        flash("Venue " + venue_to_delete[0]['name'] + " could not be deleted")
-    return None
+    # Archives the venue; its shows are archived too, or deleted with
+    # ?shows=delete. Progress is streamed as the batches commit.
+    return stream_archive(Venue, venue_id)
 
 #  Artists
 #  ----------------------------------------------------------------
 @app.route('/artists')
+@read_replica
+@conditional(Artist)
 def artists():
-    return render_template(
-        'pages/artists.html',
-        artists=Artist.query.order_by('id').all()
-    )
+    genre = request.args.get('genre')
+    if genre:
+        artists = db.session.query(Artist.id, Artist.name).filter(
+            Artist.archived_at.is_(None), genre_filter(Artist.genres, genre)
+        ).order_by(Artist.id)
+        blocks = [render_fragment('fragments/artist_block.html', artists=artists)]
+    else:
+        blocks = artist_block_fragments()
+    return render_template('pages/artists.html', blocks=blocks)
 
 
 @app.route('/artists/search', methods=['POST'])
+@read_replica
 def search_artists():
     # seach for "A" should return "Guns N Petals", "Matt Quevado", and "The Wild Sax Band".
     # search for "band" should return "The Wild Sax Band".
-    search_term = request.form.get('search_term')
-    artists = Artist.query.filter(Artist.name.ilike("%{}%".format(search_term))).all()
+    search_term = request.form.get('search_term', '')
+    artists = search_table(
+        db.session, Artist.__table__, search_term, app.config['SEARCH_RESULTS_LIMIT']
+    )
 
-    response={
+    response = {
         "count": len(artists),
-        "data": [a for a in artists]
+        "data": artists
     }
     return render_template(
         'pages/search_artists.html',
@@ -214,69 +893,110 @@ def search_artists():
     )
 
 
+@app.route('/artists/autocomplete')
+@read_replica
+def autocomplete_artists():
+    limit = max(1, min(request.args.get('limit', 10, type=int), 50))
+    return jsonify({
+        "data": name_index(artist_names, Artist).search(request.args.get('q', ''), limit)
+    })
+
+
 @app.route('/artists/<int:artist_id>')
+@read_replica
+@conditional(Artist, Show, Venue, changed_at=last_show_started(Show.artist_id, 'artist_id'))
 def show_artist(artist_id):
     # shows the artist page with the given artist_id
     return render_template(
         'pages/show_artist.html',
-        artist=Artist.query.get(artist_id)
+        artist=artist_detail(artist_id)
     )
 
+@app.route('/artists/<int:artist_id>', methods=['DELETE'])
+def delete_artist(artist_id):
+    # Same as delete_venue.
+    return stream_archive(Artist, artist_id)
+
 #  Update
 #  ----------------------------------------------------------------
 @app.route('/artists/<int:artist_id>/edit', methods=['GET'])
 def edit_artist(artist_id):
-    form = ArtistForm()
-    return render_template('forms/edit_artist.html', form=form, artist=Artist.query.get(artist_id))
+    artist = Artist.query.filter_by(id=artist_id, archived_at=None).first_or_404()
+    return render_template('forms/edit_artist.html', form=ArtistForm(obj=artist), artist=artist)
 
 
 @app.route('/artists/<int:artist_id>/edit', methods=['POST'])
 def edit_artist_submission(artist_id):
-    # artist record with ID <artist_id> using the new attributes
+    # Only submitted fields that differ from the stored artist are written,
+    # and only if nobody else has edited the artist since the form was
+    # opened (the hidden version).
+    result = ArtistForm(request.form)
+    values = editable_values(Artist, result)
+    version = request.form.get('version', type=int)
+    outcome = 'error'
     try:
-        result = ArtistForm(request.form)
-        artist = Artist.query.get(artist_id)
-        artist.name = result.name.data
-        artist.genres = result.genres.data
-        artist.city = result.city.data
-        artist.state = result.state.data
-        artist.phone = result.phone.data
-
-        db.session.commit()
+        outcome, changed = update_versioned(Artist, artist_id, version, values)
+        if outcome == 'updated':
+            if 'name' in changed:
+                artist_names.add(artist_id, changed['name'])
+            fragment_cache.invalidate(artist_block_key(artist_id), ('artist', artist_id))
+            calendar_cache.invalidate('artists')
     except:
         db.session.rollback()
-        print(sys.exc_info())
-
+        app.logger.exception('Could not update artist %s', artist_id)
     finally:
         db.session.close()
 
+    if outcome == 'missing':
+        abort(404)
+    if outcome == 'conflict':
+        artist = Artist.query.filter_by(id=artist_id).first_or_404()
+        flash('Artist ' + artist.name + ' was changed by someone else while you were editing. '
+              'Review the current details and submit again.')
+        return render_template('forms/edit_artist.html', form=ArtistForm(obj=artist), artist=artist), 409
+    if outcome == 'error':
+        flash('An error occurred. Artist could not be updated.')
     return redirect(url_for('show_artist', artist_id=artist_id))
 
 
 @app.route('/venues/<int:venue_id>/edit', methods=['GET'])
 def edit_venue(venue_id):
-    form = VenueForm()
-    return render_template('forms/edit_venue.html', form=form, venue=Venue.query.get(venue_id))
+    venue = Venue.query.filter_by(id=venue_id, archived_at=None).first_or_404()
+    return render_template('forms/edit_venue.html', form=VenueForm(obj=venue), venue=venue)
 
 
 @app.route('/venues/<int:venue_id>/edit', methods=['POST'])
 def edit_venue_submission(venue_id):
+    # See edit_artist_submission.
+    result = VenueForm(request.form)
+    values = editable_values(Venue, result)
+    version = request.form.get('version', type=int)
+    outcome = 'error'
     try:
-        result = VenueForm(request.form)
-        venue = Venue.query.get(venue_id)
-        venue.name = result.name.data
-        venue.genres = result.genres.data
-        venue.city = result.city.data
-        venue.state = result.state.data
-        venue.phone = result.phone.data
-
-        db.session.commit()
+        outcome, changed = update_versioned(Venue, venue_id, version, values)
+        if outcome == 'updated':
+            if 'name' in changed:
+                venue_names.add(venue_id, changed['name'])
+            tags = ['venue-areas', ('venue', venue_id)]
+            if ('city' in changed or 'state' in changed) and 'city' in values and 'state' in values:
+                tags.append(area_key(values['city'], values['state']))
+            fragment_cache.invalidate(*tags)
+            calendar_cache.invalidate('venues')
     except:
         db.session.rollback()
-        print(sys.exc_info())
-
+        app.logger.exception('Could not update venue %s', venue_id)
     finally:
         db.session.close()
+
+    if outcome == 'missing':
+        abort(404)
+    if outcome == 'conflict':
+        venue = Venue.query.filter_by(id=venue_id).first_or_404()
+        flash('Venue ' + venue.name + ' was changed by someone else while you were editing. '
+              'Review the current details and submit again.')
+        return render_template('forms/edit_venue.html', form=VenueForm(obj=venue), venue=venue), 409
+    if outcome == 'error':
+        flash('An error occurred. Venue could not be updated.')
     return redirect(url_for('show_venue', venue_id=venue_id))
 
 
@@ -308,10 +1028,12 @@ def create_artist_submission():
         )
         db.session.add(artist)
         db.session.commit()
+        artist_names.add(artist.id, artist.name)
+        fragment_cache.invalidate('artist-blocks', artist_block_key(artist.id))
     except:
         error = True
         db.session.rollback()
-        print(sys.exc_info())
+        app.logger.exception('Could not create artist')
     finally:
         db.session.close()
     if error:
@@ -328,18 +1050,62 @@ def create_artist_submission():
 #  ----------------------------------------------------------------
 
 @app.route('/shows')
+@read_replica
+@conditional(Show, Venue, Artist)
 def shows():
-    # displays list of shows at /shows
-    shows = Show.query.all()
-    data = [{
-        "venue_id": s.venue_id,
-        "venue_name": Venue.query.filter(Venue.id == s.venue_id).all()[0].name,
-        "artist_id": s.artist_id,
-        "artist_name": Artist.query.filter(Artist.id == s.artist_id).all()[0].name,
-        "artist_image_link": Artist.query.filter(Artist.id == s.artist_id).all()[0].image_link,
-        "start_time": s.start_time
-    } for s in shows]
-    return render_template('pages/shows.html', shows=data)
+    # displays list of shows at /shows, one keyset page at a time
+    after = request.args.get('after')
+    if after is not None:
+        try:
+            after = decode_show_cursor(after)
+        except ValueError:
+            abort(400)
+    return stream_template(
+        'pages/shows.html',
+        fragments=show_page_fragments(after, app.config['SHOWS_PER_PAGE'])
+    )
+
+
+@app.route('/shows/calendar')
+@read_replica
+def shows_calendar():
+    # What's on in a city between two times, streamed as NDJSON:
+    #   /shows/calendar?city=San Francisco&state=CA&start=2026-10-18T18:00&end=2026-10-19
+    #   /shows/calendar?city=San Francisco&state=CA&window=tonight|weekend
+    # Without end, the day from start is listed.
+    city = request.args.get('city')
+    state = request.args.get('state')
+    window = request.args.get('window')
+    if not city:
+        abort(400)
+    now = datetime.now()
+    if window:
+        span = calendar_window(window, now)
+        if span is None:
+            abort(400)
+        start, end = span
+    else:
+        try:
+            start = datetime.fromisoformat(request.args['start'])
+            end = request.args.get('end')
+            end = datetime.fromisoformat(end) if end else start + timedelta(days=1)
+        except (KeyError, ValueError):
+            abort(400)
+    if end <= start or end - start > timedelta(days=app.config['CALENDAR_MAX_DAYS']):
+        abort(400)
+
+    if window:
+        key = ('calendar', window, city, state)
+        body = calendar_cache.get(key)
+        if body is None:
+            body = calendar_cache.capture(
+                key, calendar_lines(city, state, start, end), tags=['shows', 'venues', 'artists'], wrap=None
+            )
+        else:
+            body = [body]
+    else:
+        body = calendar_lines(city, state, start, end)
+    return Response(stream_with_context(body), mimetype='application/x-ndjson')
 
 
 @app.route('/shows/create')
@@ -353,30 +1119,200 @@ def create_shows():
 def create_show_submission():
     # called to create new shows in the db, upon submitting new show listing form
     error = False
+    conflicts = []
     try:
         result = ShowForm(request.form)
-        show = Show(
-            artist_id=result.artist_id.data,
-            venue_id=result.venue_id.data,
-            start_time=result.start_time.data
-        )
-        db.session.add(show)
-        db.session.commit()
+        artist_id = int(result.artist_id.data)
+        venue_id = int(result.venue_id.data)
+        start_time = result.start_time.data
+        # Lock the venue and the artist (in that order, see booking.py) until
+        # the commit, so concurrent bookings of either wait here and then see
+        # this show in their conflict check instead of both inserting.
+        for model, item_id in ((Venue, venue_id), (Artist, artist_id)):
+            locked = db.session.query(model.id).filter_by(id=item_id, archived_at=None).with_for_update()
+            if locked.scalar() is None:
+                raise ValueError('no active {} {}'.format(model.__tablename__, item_id))
+        conflicts = find_conflicts(db.session, Show, venue_id, artist_id, start_time, SHOW_DURATION)
+        if not conflicts:
+            show = Show(artist_id=artist_id, venue_id=venue_id, start_time=start_time)
+            db.session.add(show)
+            db.session.commit()
+            fragment_cache.invalidate('shows')
+            calendar_cache.invalidate('shows')
     except:
         error = True
         db.session.rollback()
-        print(sys.exc_info())
+        app.logger.exception('Could not create show')
     finally:
         db.session.close()
     if error:
         # on failure db insert, flash error
         flash('An error occurred. Show could not be listed.')
+    elif conflicts:
+        clashes = ['the {} is already booked at {}'.format(
+            'venue' if conflict.venue_id == venue_id else 'artist',
+            format_datetime(conflict.start_time, 'full')
+        ) for conflict in conflicts]
+        flash('Show could not be listed: ' + '; '.join(clashes) + '.')
     else:
         # on successful db insert, flash success
         flash('Show was successfully listed!')
 
     return render_template('pages/home.html')
 
+#----------------------------------------------------------------------------#
+# API.
+#----------------------------------------------------------------------------#
+
+PROFILE_COLUMNS = ['id', 'name', 'city', 'state', 'phone', 'genres', 'image_link', 'facebook_link', 'version']
+
+venue_resource = Resource(
+    'venues', Venue, PROFILE_COLUMNS + ['address'],
+    criteria=lambda: [Venue.archived_at.is_(None)]
+)
+artist_resource = Resource(
+    'artists', Artist, PROFILE_COLUMNS,
+    criteria=lambda: [Artist.archived_at.is_(None)]
+)
+show_resource = Resource(
+    'shows', Show, ['id', 'venue_id', 'artist_id', 'start_time'],
+    order=('start_time', 'id'),
+    # Shows of an archived venue or artist may not have been archived yet.
+    criteria=lambda: [
+        Show.archived_at.is_(None),
+        Show.start_time.isnot(None),
+        db.exists().where(db.and_(Venue.id == Show.venue_id, Venue.archived_at.is_(None))),
+        db.exists().where(db.and_(Artist.id == Show.artist_id, Artist.archived_at.is_(None)))
+    ]
+)
+venue_resource.include('shows', show_resource, 'venue_id', 'id', limit=app.config['API_INCLUDE_LIMIT'])
+artist_resource.include('shows', show_resource, 'artist_id', 'id', limit=app.config['API_INCLUDE_LIMIT'])
+show_resource.include('venue', venue_resource, 'id', 'venue_id', many=False)
+show_resource.include('artist', artist_resource, 'id', 'artist_id', many=False)
+
+api = Api(db, page_size=app.config['API_PAGE_SIZE'], max_page_size=app.config['API_MAX_PAGE_SIZE'])
+app.register_blueprint(api.blueprint(
+    [venue_resource, artist_resource, show_resource],
+    decorators=[read_replica, conditional(Venue, Artist, Show)]
+))
+
+#----------------------------------------------------------------------------#
+# Commands.
+#----------------------------------------------------------------------------#
+
+@app.cli.command('rebuild-typeahead')
+def rebuild_typeahead():
+    """Rebuild the venue and artist autocomplete indexes and report their size."""
+    for label, index, model in (('venues', venue_names, Venue), ('artists', artist_names, Artist)):
+        started = datetime.now()
+        index.rebuild(active_names(model))
+        stats = index.stats()
+        click.echo('{}: {} names, {} keys, ~{} KiB, built in {}'.format(
+            label, stats['items'], stats['entries'], stats['approx_bytes'] // 1024,
+            datetime.now() - started
+        ))
+        if stats['entries'] >= index.max_entries:
+            click.echo('  warning: TYPEAHEAD_MAX_ENTRIES reached, some names are not indexed')
+
+
+@app.cli.command('import-data')
+@click.argument('kind', type=click.Choice(['venues', 'artists', 'shows']))
+@click.argument('path', type=click.Path(exists=True, dir_okay=False))
+@click.option('--batch-size', default=1000, show_default=True, help='Rows per insert and commit.')
+@click.option('--resume', is_flag=True, help='Continue after the last committed batch.')
+@click.option('--copy', 'use_copy', is_flag=True, help='Insert with PostgreSQL COPY.')
+@click.option('--dry-run', is_flag=True, help='Validate and check bookings without inserting.')
+def import_data(kind, path, batch_size, resume, use_copy, dry_run):
+    """Bulk load venues, artists or shows from a CSV or JSONL file."""
+    if use_copy and db.engine.dialect.name != 'postgresql':
+        raise click.UsageError('--copy needs a PostgreSQL database')
+
+    def progress(stats):
+        click.echo('line {line}: {inserted} inserted, {rejected} rejected'.format(**stats))
+
+    # The forms need a request context, but CSRF does not apply here.
+    with app.test_request_context():
+        if kind == 'shows':
+            validate = ShowValidator(
+                ShowForm, ['start_time'],
+                venues=ForeignKeyResolver(db.session, Venue),
+                artists=ForeignKeyResolver(db.session, Artist)
+            )
+            check_batch = BatchBookingValidator(
+                db.session, Show, SHOW_DURATION,
+                lock=() if dry_run else ((Venue, 'venue_id'), (Artist, 'artist_id'))
+            )
+            model = Show
+        else:
+            model, form_class = (Venue, VenueForm) if kind == 'venues' else (Artist, ArtistForm)
+            columns = [c.name for c in model.__table__.columns if c.name != 'id']
+            validate = FormValidator(form_class, columns)
+            check_batch = None
+
+        importer = BulkImporter(
+            db.session, model.__table__, validate,
+            batch_size=batch_size, use_copy=use_copy, progress=progress,
+            check_batch=check_batch, dry_run=dry_run
+        )
+        if resume:
+            click.echo('resuming after line {}'.format(importer.load_checkpoint(path)))
+        stats = importer.run(path, resume=resume)
+
+    click.echo('done{}: {inserted} {}, {rejected} rejected, {skipped} skipped'.format(
+        ' (dry run)' if dry_run else '', 'accepted' if dry_run else 'inserted', **stats
+    ))
+    if stats['rejected']:
+        click.echo('rejected rows written to {}.rejects.jsonl'.format(path))
+
+
+@app.cli.command('archive')
+@click.argument('kind', type=click.Choice(['venue', 'artist']))
+@click.argument('item_id', type=int)
+@click.option('--delete-shows', is_flag=True, help='Delete the shows instead of archiving them.')
+@click.option('--batch-size', type=int, help='Shows per batch (default ARCHIVE_BATCH_SIZE).')
+def archive(kind, item_id, delete_shows, batch_size):
+    """Archive a venue or artist with its shows, in batches."""
+    model = Venue if kind == 'venue' else Artist
+    stats = None
+    for stats in archive_listing(model, item_id, delete_shows, batch_size):
+        click.echo('{shows_done}/{shows_total} shows {action}'.format(**stats))
+    if stats is None:
+        raise click.ClickException('no {} {}'.format(kind, item_id))
+    click.echo('{} {} archived'.format(kind, item_id))
+
+
+@app.route('/status/cache')
+def cache_status():
+    return jsonify(fragment_cache.stats())
+
+
+def engines():
+    named = {'primary': db.engine}
+    for bind in app.config['SQLALCHEMY_BINDS']:
+        named[bind] = db.get_engine(app, bind=bind)
+    return named
+
+
+@app.route('/status/pool')
+def pool_status_view():
+    return jsonify({name: pool_status(engine) for name, engine in engines().items()})
+
+
+@app.route('/metrics')
+def metrics_view():
+    gauges = []
+    for name, engine in engines().items():
+        status = pool_status(engine)
+        for key in ('size', 'checked_out', 'overflow'):
+            if key in status:
+                gauges.append(('db_pool_' + key, {'engine': name}, status[key]))
+        if 'checkouts' in status:
+            gauges.append(('db_pool_checkouts', {'engine': name}, status['checkouts']))
+            gauges.append(('db_pool_checkout_timeouts', {'engine': name}, status['timeouts']))
+            gauges.append(('db_pool_wait_ms_max', {'engine': name}, status['wait_ms_max']))
+    return Response(metrics.render(gauges), mimetype='text/plain; version=0.0.4')
+
+
 @app.errorhandler(404)
 def not_found_error(error):
     return render_template('errors/404.html'), 404
@@ -387,14 +1323,7 @@ def server_error(error):
 
 
 if not app.debug:
-    file_handler = FileHandler('error.log')
-    file_handler.setFormatter(
-        Formatter('%(asctime)s %(levelname)s: %(message)s [in %(pathname)s:%(lineno)d]')
-    )
-    app.logger.setLevel(logging.INFO)
-    file_handler.setLevel(logging.INFO)
-    app.logger.addHandler(file_handler)
-    app.logger.info('errors')
+    init_logging(app)
 
 #----------------------------------------------------------------------------#
 # Launch.
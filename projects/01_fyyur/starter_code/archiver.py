@@ -0,0 +1,67 @@
+"""
+Archive a venue or an artist together with its shows.
+
+The venue or artist row is soft-deleted first (archived_at is set), so it
+drops out of every listing straight away. Its shows are then archived or
+deleted a batch of ids at a time, one commit per batch, so no transaction
+holds locks on, or loads, more than batch_size shows however long the
+history is. An interrupted run can simply be repeated: it picks up the
+shows that are left.
+"""
+from datetime import datetime
+
+from sqlalchemy import func, select
+
+
+def archive_with_shows(session, owner_table, show_table, owner_column, owner_id,
+                       delete_shows=False, batch_size=1000):
+    """
+    Archive the owner_table row owner_id and its shows (rows of show_table
+    whose owner_column matches), or delete the shows if delete_shows.
+
+    :return: a generator of progress stats dicts, one once the row is
+        archived and one after every batch of shows; nothing if there is
+        no such row
+    """
+    now = datetime.utcnow()
+    show_fk = show_table.c[owner_column]
+    found = session.execute(
+        select([owner_table.c.id]).where(owner_table.c.id == owner_id)
+    ).first()
+    if found is None:
+        return
+    session.execute(
+        owner_table.update().where(
+            owner_table.c.id == owner_id
+        ).where(
+            owner_table.c.archived_at.is_(None)
+        ).values(archived_at=now)
+    )
+    session.commit()
+
+    remaining = select([show_table.c.id]).where(show_fk == owner_id)
+    if not delete_shows:
+        remaining = remaining.where(show_table.c.archived_at.is_(None))
+    stats = {
+        "shows_total": session.execute(
+            select([func.count()]).select_from(remaining.alias())
+        ).scalar(),
+        "shows_done": 0,
+        "batches": 0,
+        "action": "deleted" if delete_shows else "archived"
+    }
+    yield stats
+
+    while True:
+        ids = [row[0] for row in session.execute(remaining.order_by(show_table.c.id).limit(batch_size))]
+        if not ids:
+            break
+        batch = show_table.c.id.in_(ids)
+        if delete_shows:
+            session.execute(show_table.delete().where(batch))
+        else:
+            session.execute(show_table.update().where(batch).values(archived_at=now))
+        session.commit()
+        stats['shows_done'] += len(ids)
+        stats['batches'] += 1
+        yield stats
@@ -0,0 +1,58 @@
+"""
+Micro-benchmark the Jinja datetime filter: the old parse-every-value
+formatter against format_datetime() with its datetime fast path and cached
+Babel patterns, rendering a shows-like template.
+
+    python benchmarks/bench_datetime.py [--shows 100000]
+"""
+import argparse
+import time
+from datetime import datetime, timedelta
+
+import babel.dates
+import dateutil.parser
+
+from common import app
+
+from app import format_datetime
+
+TEMPLATE = "{% for show in shows %}<h4>{{ show.start_time|datetime('full') }}</h4>{% endfor %}"
+
+
+def legacy_format_datetime(value, format='medium'):
+    date = dateutil.parser.parse(str(value))
+    if format == 'full':
+        format = "EEEE MMMM, d, y 'at' h:mma"
+    elif format == 'medium':
+        format = "EE MM, dd, y h:mma"
+    return babel.dates.format_datetime(date, format)
+
+
+def render(filter_fn, shows):
+    env = app.jinja_env.overlay()
+    env.filters['datetime'] = filter_fn
+    template = env.from_string(TEMPLATE)
+    start = time.perf_counter()
+    html = template.render(shows=shows)
+    return (time.perf_counter() - start) * 1000, html
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--shows', type=int, default=100000)
+    args = parser.parse_args()
+
+    now = datetime(2026, 1, 1, 20, 0)
+    shows = [{'start_time': now + timedelta(hours=i)} for i in range(args.shows)]
+
+    legacy_ms, legacy_html = render(legacy_format_datetime, shows)
+    fast_ms, fast_html = render(format_datetime, shows)
+    assert legacy_html == fast_html, 'formatters disagree'
+
+    print('Rendering {} show start times'.format(args.shows))
+    print('  legacy filter   {:>10.1f} ms'.format(legacy_ms))
+    print('  fast filter     {:>10.1f} ms  ({:.1f}x faster)'.format(fast_ms, legacy_ms / fast_ms))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,59 @@
+"""
+Benchmark venue and artist detail pages for owners with very different show
+histories: walking the whole shows backref against venue_detail() /
+artist_detail().
+
+    python benchmarks/bench_detail.py [--shows 50000]
+"""
+import argparse
+from datetime import datetime, timedelta
+
+from common import app, db, Venue, Show, measure, report, seed
+
+from app import venue_detail
+
+
+def legacy_venue_detail(venue_id):
+    venue = Venue.query.get(venue_id)
+    now = datetime.now()
+    return {
+        "upcoming_shows": [s for s in venue.shows if s.start_time > now],
+        "past_shows": [s for s in venue.shows if s.start_time <= now],
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--shows', type=int, default=50000)
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+
+    client = app.test_client()
+    rows = []
+    with app.app_context():
+        # Venue 1 gets a long history on top of the evenly spread shows.
+        seed(venues=1000, artists=1000, shows=5000)
+        now = datetime.now()
+        db.session.execute(Show.__table__.insert(), [
+            {'venue_id': 1, 'artist_id': i % 1000 + 1, 'start_time': now - timedelta(hours=i)}
+            for i in range(args.shows)
+        ])
+        db.session.commit()
+        quiet = db.session.query(Show.venue_id).group_by(Show.venue_id).order_by(
+            db.func.count(Show.id)
+        ).first()[0]
+
+        for venue_id, label in ((quiet, 'few shows'), (1, '{} shows'.format(args.shows))):
+            count = Show.query.filter_by(venue_id=venue_id).count()
+            rows.append(('legacy backref, ' + label, count) +
+                        measure(lambda: legacy_venue_detail(venue_id), args.repeat))
+            with app.test_request_context():
+                rows.append(('venue_detail(), ' + label, count) +
+                            measure(lambda: venue_detail(venue_id), args.repeat))
+            rows.append(('GET /venues/<id>, ' + label, count) +
+                        measure(lambda: client.get('/venues/{}'.format(venue_id)), args.repeat))
+    report('Venue detail page', rows)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,47 @@
+"""
+Benchmark filtering by genre: a LIKE scan over the stored venue genres
+against genre_filter() (GIN-indexed "genres @> ARRAY[...]" on PostgreSQL),
+and the /venues?genre= and /artists?genre= pages built on it.
+Most meaningful with DATABASE_URL pointing at PostgreSQL; SQLite has no
+array index and scans either way.
+
+    python benchmarks/bench_genres.py [--sizes 100000]
+"""
+import argparse
+
+from common import app, db, Venue, measure, report, seed
+
+from app import genre_filter
+
+GENRES = ['Jazz', 'Classical', 'Reggae']
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--sizes', type=int, nargs='+', default=[100000])
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+
+    client = app.test_client()
+    rows = []
+    with app.app_context():
+        for size in args.sizes:
+            seed(venues=size, artists=size, shows=0)
+            for genre in GENRES:
+                rows.append(('LIKE "%{}%"'.format(genre), size) + measure(
+                    lambda: db.session.query(Venue.id).filter(
+                        db.cast(Venue.genres, db.Text).like('%{}%'.format(genre))
+                    ).all(), args.repeat))
+                rows.append(('genre_filter "{}"'.format(genre), size) + measure(
+                    lambda: db.session.query(Venue.id).filter(
+                        genre_filter(Venue.genres, genre)
+                    ).all(), args.repeat))
+                rows.append(('GET /venues?genre={}'.format(genre), size) + measure(
+                    lambda: client.get('/venues', query_string={'genre': genre}), args.repeat))
+                rows.append(('GET /artists?genre={}'.format(genre), size) + measure(
+                    lambda: client.get('/artists', query_string={'genre': genre}), args.repeat))
+    report('Genre filter ({})'.format(db.engine.dialect.name), rows)
+
+
+if __name__ == '__main__':
+    main()
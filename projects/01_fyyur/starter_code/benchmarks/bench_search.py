@@ -0,0 +1,42 @@
+"""
+Benchmark venue search: the old unranked name ILIKE scan against the
+indexed, ranked search_table() (trigram/tsvector on PostgreSQL, FTS5 on
+SQLite).
+
+    python benchmarks/bench_search.py [--sizes 10000 100000]
+"""
+import argparse
+
+from common import app, db, Venue, measure, report, seed
+
+from search import search_table
+
+TERMS = ['hop', 'music coffee', 'velvet', 'city 12']
+
+
+def legacy_search(term):
+    return Venue.query.filter(Venue.name.ilike("%{}%".format(term))).all()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--sizes', type=int, nargs='+', default=[10000, 100000])
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+
+    limit = app.config['SEARCH_RESULTS_LIMIT']
+    rows = []
+    with app.app_context():
+        for size in args.sizes:
+            seed(venues=size, artists=1, shows=0)
+            for term in TERMS:
+                rows.append(('ilike "{}"'.format(term), size) +
+                            measure(lambda: legacy_search(term), args.repeat))
+                rows.append(('search_table "{}"'.format(term), size) +
+                            measure(lambda: search_table(db.session, Venue.__table__, term, limit),
+                                    args.repeat))
+    report('Venue search ({})'.format(db.engine.dialect.name), rows)
+
+
+if __name__ == '__main__':
+    main()
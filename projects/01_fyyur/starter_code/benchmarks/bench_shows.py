@@ -0,0 +1,59 @@
+"""
+Benchmark the /shows listing: the old load-everything, three-queries-per-show
+approach against one keyset page from the joined, streamed ShowListing.
+
+    python benchmarks/bench_shows.py [--sizes 1000 10000 100000]
+"""
+import argparse
+
+from common import app, db, Venue, Artist, Show, measure, report, seed
+
+from app import ShowListing
+
+# The legacy path issues 3N+1 queries; past this size it takes minutes.
+LEGACY_LIMIT = 10000
+
+
+def legacy_shows():
+    return [{
+        "venue_id": s.venue_id,
+        "venue_name": Venue.query.filter(Venue.id == s.venue_id).all()[0].name,
+        "artist_id": s.artist_id,
+        "artist_name": Artist.query.filter(Artist.id == s.artist_id).all()[0].name,
+        "artist_image_link": Artist.query.filter(Artist.id == s.artist_id).all()[0].image_link,
+        "start_time": s.start_time
+    } for s in Show.query.all()]
+
+
+def last_page_cursor():
+    # Cursor pointing just before the final page, to show that deep pages
+    # cost the same as the first one.
+    row = db.session.query(Show.start_time, Show.id).order_by(
+        Show.start_time.desc(), Show.id.desc()
+    ).offset(app.config['SHOWS_PER_PAGE']).first()
+    return tuple(row)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--sizes', type=int, nargs='+', default=[1000, 10000, 100000])
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+
+    client = app.test_client()
+    limit = app.config['SHOWS_PER_PAGE']
+    rows = []
+    with app.app_context():
+        for size in args.sizes:
+            seed(venues=max(size // 20, 1), artists=max(size // 10, 1), shows=size)
+            if size <= LEGACY_LIMIT:
+                rows.append(('legacy 3N+1 listing', size) + measure(legacy_shows, 1))
+            rows.append(('first page', size) + measure(lambda: list(ShowListing(limit=limit)), args.repeat))
+            after = last_page_cursor()
+            rows.append(('last page', size) + measure(lambda: list(ShowListing(after, limit)), args.repeat))
+            rows.append(('GET /shows', size) + measure(lambda: client.get('/shows').data, args.repeat))
+    report('Show listing', rows)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,39 @@
+"""
+Benchmark autocomplete lookups against the in-memory PrefixIndex, with the
+equivalent name ILIKE 'prefix%' query for comparison.
+
+    python benchmarks/bench_typeahead.py [--sizes 10000 100000]
+"""
+import argparse
+
+from common import app, db, Venue, measure, report, seed
+
+from typeahead import PrefixIndex
+
+PREFIXES = ['m', 'mus', 'velvet l', 'hop', 'zzz']
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--sizes', type=int, nargs='+', default=[10000, 100000])
+    parser.add_argument('--repeat', type=int, default=200)
+    args = parser.parse_args()
+
+    rows = []
+    with app.app_context():
+        for size in args.sizes:
+            seed(venues=size, artists=1, shows=0)
+            index = PrefixIndex(max_entries=10 * size)
+            rows.append(('build index', size) + measure(
+                lambda: index.rebuild(db.session.query(Venue.id, Venue.name)), 1))
+            for prefix in PREFIXES:
+                rows.append(('ilike "{}%"'.format(prefix), size) + measure(
+                    lambda: Venue.query.filter(Venue.name.ilike(prefix + '%')).limit(10).all(), 5))
+                rows.append(('index "{}"'.format(prefix), size) + measure(
+                    lambda: index.search(prefix), args.repeat))
+            print('{} venues: {}'.format(size, index.stats()))
+    report('Typeahead', rows)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,45 @@
+"""
+Benchmark the /venues area listing: the old distinct-then-query-per-area
+approach against the single grouped query in venue_areas().
+
+    python benchmarks/bench_venues.py [--sizes 10000 100000]
+"""
+import argparse
+
+from common import app, db, Venue, measure, report, seed
+
+from app import venue_areas
+
+
+def legacy_venue_areas():
+    # What venues() used to do: one query for the distinct locations, then
+    # one query per location to fetch its venues.
+    locations = db.session.query(Venue.city, Venue.state).distinct().all()
+    return [
+        {
+            "city": city,
+            "state": state,
+            "venues": Venue.query.filter(Venue.city == city, Venue.state == state).all()
+        } for city, state in locations
+    ]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--sizes', type=int, nargs='+', default=[10000, 100000])
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+
+    client = app.test_client()
+    rows = []
+    with app.app_context():
+        for size in args.sizes:
+            seed(venues=size, artists=max(size // 10, 1), shows=size)
+            rows.append(('legacy per-area queries', size) + measure(legacy_venue_areas, args.repeat))
+            rows.append(('venue_areas()', size) + measure(venue_areas, args.repeat))
+            rows.append(('GET /venues', size) + measure(lambda: client.get('/venues'), args.repeat))
+    report('Venue area listing', rows)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,159 @@
+"""
+Shared helpers for the fyyur benchmarks.
+
+Run a benchmark from the starter_code directory, e.g.
+
+    python benchmarks/bench_venues.py
+
+By default the benchmarks use a throwaway SQLite file. Set DATABASE_URL to
+a (disposable!) PostgreSQL database to benchmark against the real thing;
+seeding drops and recreates every table.
+"""
+import itertools
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir))
+os.environ.setdefault(
+    'DATABASE_URL',
+    'sqlite:///' + os.path.join(tempfile.gettempdir(), 'fyyur_bench.db')
+)
+
+from sqlalchemy import event
+
+from app import app, db, Venue, Artist, Show
+
+STATES = ['CA', 'NY', 'TX', 'WA', 'IL', 'FL', 'OR', 'MA', 'GA', 'CO']
+GENRES = ['Jazz', 'Blues', 'Rock n Roll', 'Folk', 'Hip-Hop', 'Classical', 'Pop', 'Soul']
+WORDS = [
+    'Musical', 'Hop', 'Park', 'Square', 'Live', 'Music', 'Coffee', 'Dueling',
+    'Pianos', 'Bar', 'Wild', 'Sax', 'Band', 'Guns', 'Petals', 'Blue', 'Moon',
+    'Velvet', 'Echo', 'Lounge', 'Garden', 'Hall', 'Electric', 'Crow', 'Harbor',
+    'Lantern', 'Station', 'Orchard', 'Static', 'Fox', 'Riot', 'Cellar'
+]
+BATCH_SIZE = 5000
+
+
+def _batched(table, rows, progress=None):
+    batch = []
+    done = 0
+    for row in rows:
+        batch.append(row)
+        if len(batch) == BATCH_SIZE:
+            db.session.execute(table.insert(), batch)
+            done += len(batch)
+            batch = []
+            if progress:
+                progress(table.name, done)
+    if batch:
+        db.session.execute(table.insert(), batch)
+        done += len(batch)
+    if progress:
+        progress(table.name, done)
+
+
+def popularity(count, skew):
+    """Cumulative weights for ids 1..count; skew 0 is uniform, ~1 is Zipf-like."""
+    return list(itertools.accumulate(1.0 / (i ** skew) for i in range(1, count + 1)))
+
+
+def seed(venues, artists, shows, areas=200, seed=0, skew=0.0, progress=None):
+    """
+    Recreate the schema and fill it with reproducible fake data. With skew
+    above 0 a few venues and artists get most of the shows, as in real
+    listings. progress, if given, is called with (table name, rows so far).
+    """
+    rng = random.Random(seed)
+    locations = [('City {}'.format(i), STATES[i % len(STATES)]) for i in range(areas)]
+    now = datetime.now()
+
+    db.drop_all()
+    db.create_all()
+
+    def people(prefix, count):
+        for i in range(1, count + 1):
+            city, state = rng.choice(locations)
+            yield {
+                'id': i,
+                'name': '{} {} {}'.format(rng.choice(WORDS), rng.choice(WORDS), i),
+                'city': city,
+                'state': state,
+                'phone': '555-555-5555',
+                'genres': rng.sample(GENRES, rng.randint(1, 3)),
+                'image_link': 'https://example.com/{}/{}.jpg'.format(prefix.lower(), i),
+                'facebook_link': 'https://facebook.com/{}{}'.format(prefix.lower(), i)
+            }
+
+    def show_rows():
+        venue_weights = popularity(venues, skew) if skew else None
+        artist_weights = popularity(artists, skew) if skew else None
+        for start in range(1, shows + 1, BATCH_SIZE):
+            size = min(BATCH_SIZE, shows + 1 - start)
+            if skew:
+                venue_ids = rng.choices(range(1, venues + 1), cum_weights=venue_weights, k=size)
+                artist_ids = rng.choices(range(1, artists + 1), cum_weights=artist_weights, k=size)
+            else:
+                venue_ids = [rng.randint(1, venues) for _ in range(size)]
+                artist_ids = [rng.randint(1, artists) for _ in range(size)]
+            for i in range(size):
+                yield {
+                    'id': start + i,
+                    'venue_id': venue_ids[i],
+                    'artist_id': artist_ids[i],
+                    'start_time': now + timedelta(hours=rng.randint(-24 * 365, 24 * 365))
+                }
+
+    for table, rows in ((Venue.__table__, people('Venue', venues)),
+                        (Artist.__table__, people('Artist', artists)),
+                        (Show.__table__, show_rows())):
+        _batched(table, rows, progress)
+    db.session.commit()
+
+    if db.engine.dialect.name == 'postgresql':
+        # Rows were inserted with explicit ids; move the sequences past them.
+        for table in (Venue.__table__, Artist.__table__, Show.__table__):
+            db.session.execute(db.text(
+                "SELECT setval(pg_get_serial_sequence('\"{0}\"', 'id'), "
+                "coalesce(max(id), 0) + 1, false) FROM \"{0}\"".format(table.name)
+            ))
+        db.session.commit()
+
+
+@contextmanager
+def count_queries():
+    """Count the statements sent to the database inside the block."""
+    counter = {'queries': 0}
+
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        counter['queries'] += 1
+
+    event.listen(db.engine, 'before_cursor_execute', before_cursor_execute)
+    try:
+        yield counter
+    finally:
+        event.remove(db.engine, 'before_cursor_execute', before_cursor_execute)
+
+
+def measure(fn, repeat=5):
+    """Run fn repeat times; return (median ms, queries per run)."""
+    timings = []
+    with count_queries() as counter:
+        for _ in range(repeat):
+            start = time.perf_counter()
+            fn()
+            timings.append((time.perf_counter() - start) * 1000)
+            db.session.remove()
+    return statistics.median(timings), counter['queries'] // repeat
+
+
+def report(title, rows):
+    print(title)
+    print('  {:<28} {:>10} {:>12} {:>9}'.format('case', 'rows', 'median ms', 'queries'))
+    for name, size, ms, queries in rows:
+        print('  {:<28} {:>10} {:>12.2f} {:>9}'.format(name, size, ms, queries))
@@ -0,0 +1,56 @@
+"""
+Fill the database with reproducible synthetic venues, artists and shows.
+
+    python benchmarks/generate.py --scale 100k
+    DATABASE_URL=postgresql://localhost/fyyur_bench python benchmarks/generate.py --scale 1m
+
+The same --scale/--seed/--skew always produce the same rows (show times
+are relative to now). Every table is dropped and recreated first.
+"""
+import argparse
+import sys
+import time
+
+from common import app, db, seed
+
+# Named scales: (venues, artists, shows)
+SCALES = {
+    '1k': (100, 200, 1000),
+    '10k': (500, 1000, 10000),
+    '100k': (2000, 5000, 100000),
+    '1m': (10000, 25000, 1000000),
+}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--scale', choices=sorted(SCALES), default='10k')
+    parser.add_argument('--venues', type=int, help='override the scale\'s venue count')
+    parser.add_argument('--artists', type=int, help='override the scale\'s artist count')
+    parser.add_argument('--shows', type=int, help='override the scale\'s show count')
+    parser.add_argument('--areas', type=int, default=200, help='distinct city/state pairs')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--skew', type=float, default=1.0,
+                        help='show popularity skew; 0 spreads shows evenly')
+    args = parser.parse_args()
+
+    venues, artists, shows = SCALES[args.scale]
+    venues = args.venues or venues
+    artists = args.artists or artists
+    shows = args.shows or shows
+
+    def progress(table, rows):
+        sys.stderr.write('\r{:<8} {:>10,} rows'.format(table, rows))
+
+    started = time.perf_counter()
+    with app.app_context():
+        seed(venues, artists, shows, areas=args.areas, seed=args.seed, skew=args.skew, progress=progress)
+        url = repr(db.engine.url)
+    sys.stderr.write('\n')
+    print('{} venues, {} artists, {} shows in {:.1f}s ({})'.format(
+        venues, artists, shows, time.perf_counter() - started, url
+    ))
+
+
+if __name__ == '__main__':
+    main()
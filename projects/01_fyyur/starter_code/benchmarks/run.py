@@ -0,0 +1,286 @@
+"""
+Drive every route of app.py through the Flask test client and report, per
+route, throughput, p50/p99 latency and SQL queries per request as JSON, so
+runs can be compared between commits.
+
+    python benchmarks/run.py --scale 10k --output before.json
+    (change something)
+    python benchmarks/run.py --scale 10k --output after.json --compare before.json
+
+Reads are measured first, then writes, then the DELETE (archive) routes,
+each on its own rows. Caches stay warm between requests unless --cold is
+given. Requests run one at a time, so throughput is 1 / mean latency of a
+single worker.
+"""
+import argparse
+import json
+import os
+import platform
+import random
+import statistics
+import subprocess
+import sys
+import time
+from datetime import datetime, timedelta
+
+from common import GENRES, WORDS, app, db, Venue, Artist, Show, count_queries, seed
+from generate import SCALES
+
+import app as fyyur
+
+
+class Context(object):
+    """Sizes of the data set and a seeded rng for picking rows."""
+
+    def __init__(self, rng):
+        self.rng = rng
+        self.venues = db.session.query(db.func.max(Venue.id)).scalar() or 0
+        self.artists = db.session.query(db.func.max(Artist.id)).scalar() or 0
+        self.shows = db.session.query(db.func.count(Show.id)).scalar()
+        self.city = db.session.query(Venue.city).filter(Venue.id == 1).scalar() or 'City 0'
+        self.show_base = datetime.now() + timedelta(days=3 * 365)
+
+    def venue(self):
+        return self.rng.randint(1, self.venues)
+
+    def artist(self):
+        return self.rng.randint(1, self.artists)
+
+    def word(self):
+        return self.rng.choice(WORDS)
+
+
+def version(model, item_id):
+    return db.session.query(model.version).filter(model.id == item_id).scalar()
+
+
+def profile(prefix, i, ctx):
+    return {
+        'name': 'Bench {} {} {}'.format(prefix, ctx.word(), i),
+        'city': 'City {}'.format(i % 200),
+        'state': 'CA',
+        'address': '{} Main St'.format(i),
+        'phone': '555-555-5555',
+        'genres': ctx.rng.sample(GENRES, 2),
+        'facebook_link': 'https://facebook.com/bench{}'.format(i),
+        'image_link': ''
+    }
+
+
+def edit_request(model, path, ctx):
+    def build(i):
+        item_id = ctx.venue() if model is Venue else ctx.artist()
+        data = profile(model.__tablename__, i, ctx)
+        data['version'] = version(model, item_id)
+        return 'POST', path.format(item_id), {'data': data}
+    return build
+
+
+# endpoint -> [(case name, phase, build(i) -> (method, path, client kwargs))]
+# phase 0 reads, 1 writes, 2 archives.
+def cases(ctx):
+    get = lambda path: lambda i: ('GET', path() if callable(path) else path, {})
+    venue_ids = iter(range(ctx.venues, 0, -1))
+    artist_ids = iter(range(ctx.artists, 0, -1))
+    return {
+        'index': [('GET /', 0, get('/'))],
+        'venues': [
+            ('GET /venues', 0, get('/venues')),
+            ('GET /venues?genre=', 0, get(lambda: '/venues?genre=' + ctx.rng.choice(GENRES))),
+        ],
+        'search_venues': [('POST /venues/search', 0, lambda i: (
+            'POST', '/venues/search', {'data': {'search_term': ctx.word()}}))],
+        'autocomplete_venues': [('GET /venues/autocomplete', 0, get(
+            lambda: '/venues/autocomplete?q=' + ctx.word()[:3]))],
+        'show_venue': [('GET /venues/<id>', 0, get(lambda: '/venues/{}'.format(ctx.venue())))],
+        'create_venue_form': [('GET /venues/create', 0, get('/venues/create'))],
+        'edit_venue': [('GET /venues/<id>/edit', 0, get(lambda: '/venues/{}/edit'.format(ctx.venue())))],
+        'artists': [
+            ('GET /artists', 0, get('/artists')),
+            ('GET /artists?genre=', 0, get(lambda: '/artists?genre=' + ctx.rng.choice(GENRES))),
+        ],
+        'search_artists': [('POST /artists/search', 0, lambda i: (
+            'POST', '/artists/search', {'data': {'search_term': ctx.word()}}))],
+        'autocomplete_artists': [('GET /artists/autocomplete', 0, get(
+            lambda: '/artists/autocomplete?q=' + ctx.word()[:3]))],
+        'show_artist': [('GET /artists/<id>', 0, get(lambda: '/artists/{}'.format(ctx.artist())))],
+        'create_artist_form': [('GET /artists/create', 0, get('/artists/create'))],
+        'edit_artist': [('GET /artists/<id>/edit', 0, get(lambda: '/artists/{}/edit'.format(ctx.artist())))],
+        'shows': [('GET /shows', 0, get('/shows'))],
+        'shows_calendar': [
+            ('GET /shows/calendar?window=weekend', 0, get(
+                lambda: '/shows/calendar?city={}&window=weekend'.format(ctx.city))),
+            ('GET /shows/calendar (30 days)', 0, get(lambda: '/shows/calendar?city={}&start={}&end={}'.format(
+                ctx.city, datetime.now().date(), datetime.now().date() + timedelta(days=30)))),
+        ],
+        'create_shows': [('GET /shows/create', 0, get('/shows/create'))],
+        'cache_status': [('GET /status/cache', 0, get('/status/cache'))],
+        'pool_status_view': [('GET /status/pool', 0, get('/status/pool'))],
+        'metrics_view': [('GET /metrics', 0, get('/metrics'))],
+        'api_v1.venues_list': [
+            ('GET /api/v1/venues', 0, get('/api/v1/venues')),
+            ('GET /api/v1/venues?include=shows', 0, get(
+                '/api/v1/venues?fields=name&include=shows&fields[shows]=start_time,artist_id')),
+        ],
+        'api_v1.venues_detail': [('GET /api/v1/venues/<id>?include=shows', 0, get(
+            lambda: '/api/v1/venues/{}?include=shows'.format(ctx.venue())))],
+        'api_v1.artists_list': [('GET /api/v1/artists?limit=100', 0, get('/api/v1/artists?limit=100'))],
+        'api_v1.artists_detail': [('GET /api/v1/artists/<id>', 0, get(
+            lambda: '/api/v1/artists/{}'.format(ctx.artist())))],
+        'api_v1.shows_list': [('GET /api/v1/shows?include=venue,artist', 0, get(
+            '/api/v1/shows?include=venue,artist&fields[venue]=name&fields[artist]=name,image_link'))],
+        'api_v1.shows_detail': [('GET /api/v1/shows/<id>', 0, get(
+            lambda: '/api/v1/shows/{}'.format(ctx.rng.randint(1, ctx.shows))))],
+
+        'create_venue_submission': [('POST /venues/create', 1, lambda i: (
+            'POST', '/venues/create', {'data': profile('Venue', i, ctx)}))],
+        'create_artist_submission': [('POST /artists/create', 1, lambda i: (
+            'POST', '/artists/create', {'data': profile('Artist', i, ctx)}))],
+        'edit_venue_submission': [('POST /venues/<id>/edit', 1, edit_request(Venue, '/venues/{}/edit', ctx))],
+        'edit_artist_submission': [('POST /artists/<id>/edit', 1, edit_request(Artist, '/artists/{}/edit', ctx))],
+        'create_show_submission': [('POST /shows/create', 1, lambda i: ('POST', '/shows/create', {'data': {
+            'venue_id': ctx.venue(),
+            'artist_id': ctx.artist(),
+            'start_time': (ctx.show_base + timedelta(hours=4 * i)).strftime('%Y-%m-%d %H:%M:%S')
+        }}))],
+
+        # Archive from the highest ids down, one venue/artist per request.
+        'delete_venue': [('DELETE /venues/<id>', 2, lambda i: (
+            'DELETE', '/venues/{}'.format(next(venue_ids)), {}))],
+        'delete_artist': [('DELETE /artists/<id>', 2, lambda i: (
+            'DELETE', '/artists/{}'.format(next(artist_ids)), {}))],
+    }
+
+
+def percentile(values, p):
+    if len(values) < 2:
+        return values[0] if values else None
+    return statistics.quantiles(values, n=100, method='inclusive')[p - 1]
+
+
+def run_case(client, build, requests, warmup, cold, offset):
+    timings, queries, statuses = [], 0, {}
+    for i in range(warmup + requests):
+        method, path, kwargs = build(offset + i)
+        db.session.remove()
+        if cold:
+            fyyur.fragment_cache.clear()
+            fyyur.calendar_cache.clear()
+            fyyur.venue_names.built_at = fyyur.artist_names.built_at = None
+        with count_queries() as counter:
+            started = time.perf_counter()
+            response = client.open(path, method=method, **kwargs)
+            response.get_data()
+            response.close()
+            elapsed = time.perf_counter() - started
+        if i < warmup:
+            continue
+        timings.append(elapsed * 1000)
+        queries += counter['queries']
+        statuses[str(response.status_code)] = statuses.get(str(response.status_code), 0) + 1
+    return {
+        "method": method,
+        "requests": requests,
+        "throughput_rps": round(requests / (sum(timings) / 1000), 2),
+        "p50_ms": round(percentile(timings, 50), 3),
+        "p99_ms": round(percentile(timings, 99), 3),
+        "mean_ms": round(statistics.mean(timings), 3),
+        "queries_per_request": round(queries / requests, 2),
+        "statuses": statuses
+    }
+
+
+def git_revision():
+    try:
+        here = os.path.dirname(os.path.abspath(__file__))
+        commit = subprocess.check_output(['git', 'rev-parse', 'HEAD'], cwd=here, text=True).strip()
+        dirty = bool(subprocess.check_output(['git', 'status', '--porcelain', '.'], cwd=here, text=True).strip())
+        return commit, dirty
+    except (OSError, subprocess.CalledProcessError):
+        return None, None
+
+
+def compare(previous, current):
+    print('{:<40} {:>12} {:>12} {:>8} {:>10}'.format('route', 'p50 before', 'p50 after', 'ratio', 'queries'),
+          file=sys.stderr)
+    for name, after in current['routes'].items():
+        before = previous['routes'].get(name)
+        if before is None:
+            print('{:<40} {:>12} {:>12.2f}'.format(name, '-', after['p50_ms']), file=sys.stderr)
+            continue
+        print('{:<40} {:>12.2f} {:>12.2f} {:>8.2f} {:>4} -> {:<4}'.format(
+            name, before['p50_ms'], after['p50_ms'], after['p50_ms'] / before['p50_ms'],
+            before['queries_per_request'], after['queries_per_request']
+        ), file=sys.stderr)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--scale', choices=sorted(SCALES), default='10k')
+    parser.add_argument('--no-seed', action='store_true', help='benchmark the data already in the database')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--requests', type=int, default=50, help='measured requests per case')
+    parser.add_argument('--warmup', type=int, default=3)
+    parser.add_argument('--cold', action='store_true', help='clear the in-process caches before every request')
+    parser.add_argument('--only', help='comma separated endpoints to run')
+    parser.add_argument('--output', help='write the JSON report here instead of stdout')
+    parser.add_argument('--compare', help='earlier JSON report to compare p50 and query counts with')
+    args = parser.parse_args()
+
+    app.config['WTF_CSRF_ENABLED'] = False
+    client = app.test_client()
+    rng = random.Random(args.seed)
+    commit, dirty = git_revision()
+    report = {"meta": {
+        "git_commit": commit,
+        "git_dirty": dirty,
+        "python": platform.python_version(),
+        "started_at": datetime.now().isoformat(timespec='seconds'),
+        "requests": args.requests,
+        "warmup": args.warmup,
+        "cold": args.cold
+    }, "routes": {}}
+
+    with app.app_context():
+        if not args.no_seed:
+            venues, artists, shows = SCALES[args.scale]
+            seed(venues, artists, shows, seed=args.seed, skew=1.0)
+            report['meta']['scale'] = args.scale
+        ctx = Context(rng)
+        report['meta'].update({
+            "database": db.engine.dialect.name,
+            "venues": ctx.venues,
+            "artists": ctx.artists,
+            "shows": ctx.shows
+        })
+
+        by_endpoint = cases(ctx)
+        endpoints = [rule.endpoint for rule in app.url_map.iter_rules() if rule.endpoint != 'static']
+        report['unmeasured'] = sorted(set(endpoints) - set(by_endpoint))
+        selected = args.only.split(',') if args.only else sorted(by_endpoint)
+        planned = sorted(
+            (phase, name, build)
+            for endpoint in selected for name, phase, build in by_endpoint[endpoint]
+        )
+        offset = 0
+        for phase, name, build in planned:
+            print('{:<40}'.format(name), end='', file=sys.stderr, flush=True)
+            result = run_case(client, build, args.requests, args.warmup, args.cold, offset)
+            offset += args.requests + args.warmup
+            report['routes'][name] = result
+            print('p50 {p50_ms:>9.2f} ms  p99 {p99_ms:>9.2f} ms  {queries_per_request:>6} queries'.format(
+                **result), file=sys.stderr)
+
+    output = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, 'w') as f:
+            f.write(output + '\n')
+    else:
+        print(output)
+    if args.compare:
+        with open(args.compare) as f:
+            compare(json.load(f), report)
+
+
+if __name__ == '__main__':
+    main()
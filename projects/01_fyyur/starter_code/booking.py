@@ -0,0 +1,125 @@
+"""
+Double-booking checks for shows.
+
+Shows only record a start time, so every show is taken to occupy the
+venue and the artist for a fixed duration: two shows conflict when they
+share a venue or an artist and start less than one duration apart.
+
+A single booking is checked with one range query that the
+(venue_id, start_time) and (artist_id, start_time) indexes answer with an
+index seek. Batches (bulk schedule uploads) prefetch the existing shows
+around the batch once and check every row against sorted in-memory
+intervals with bisect, including rows earlier in the same batch.
+
+A check and the insert that follows it are only safe against concurrent
+bookings if the venue and artist rows are locked first, in the same
+transaction: always venues before artists, and by id, so bookings never
+wait on each other in a cycle.
+"""
+import bisect
+from collections import defaultdict
+
+
+def find_conflicts(session, show_model, venue_id, artist_id, start_time, duration, limit=5):
+    """Return up to limit existing shows clashing with the proposed booking."""
+    Show = show_model
+    return session.query(
+        Show.id, Show.venue_id, Show.artist_id, Show.start_time
+    ).filter(
+        (Show.venue_id == venue_id) | (Show.artist_id == artist_id),
+        Show.archived_at.is_(None),
+        Show.start_time > start_time - duration,
+        Show.start_time < start_time + duration
+    ).order_by(Show.start_time).limit(limit).all()
+
+
+class IntervalIndex(object):
+    """Sorted start times per key (a venue or an artist id)."""
+
+    def __init__(self, duration):
+        self.duration = duration
+        self._starts = defaultdict(list)
+
+    def add(self, key, start_time):
+        bisect.insort(self._starts[key], start_time)
+
+    def conflict(self, key, start_time):
+        """Return a clashing start time for key, or None."""
+        starts = self._starts.get(key)
+        if not starts:
+            return None
+        i = bisect.bisect_right(starts, start_time - self.duration)
+        if i < len(starts) and starts[i] < start_time + self.duration:
+            return starts[i]
+        return None
+
+
+class BatchBookingValidator(object):
+    """
+    Check proposed shows (dicts with venue_id, artist_id and start_time)
+    against the database and against each other.
+    """
+
+    def __init__(self, session, show_model, duration, lock=()):
+        self.session = session
+        self.Show = show_model
+        self.duration = duration
+        # (model, key) pairs, e.g. ((Venue, 'venue_id'), (Artist, 'artist_id')):
+        # rows locked FOR UPDATE before each batch is checked
+        self.lock = lock
+        self.venues = IntervalIndex(duration)
+        self.artists = IntervalIndex(duration)
+        self._loaded = set()
+
+    def prefetch(self, shows):
+        """
+        Load the existing shows that could clash with shows, in one query.
+        Rows seen before (loaded or reserved earlier) are not added twice.
+        """
+        if not shows:
+            return
+        Show = self.Show
+        venue_ids = {s['venue_id'] for s in shows}
+        artist_ids = {s['artist_id'] for s in shows}
+        low = min(s['start_time'] for s in shows) - self.duration
+        high = max(s['start_time'] for s in shows) + self.duration
+        rows = self.session.query(Show.venue_id, Show.artist_id, Show.start_time).filter(
+            Show.venue_id.in_(venue_ids) | Show.artist_id.in_(artist_ids),
+            Show.archived_at.is_(None),
+            Show.start_time > low,
+            Show.start_time < high
+        )
+        for venue_id, artist_id, start_time in rows:
+            key = (venue_id, artist_id, start_time)
+            if key not in self._loaded:
+                self._loaded.add(key)
+                self.venues.add(venue_id, start_time)
+                self.artists.add(artist_id, start_time)
+
+    def check(self, show):
+        """Return an errors dict for show, or None and reserve its slot."""
+        errors = {}
+        clash = self.venues.conflict(show['venue_id'], show['start_time'])
+        if clash is not None:
+            errors['venue_id'] = ['Venue is already booked at {}.'.format(clash)]
+        clash = self.artists.conflict(show['artist_id'], show['start_time'])
+        if clash is not None:
+            errors['artist_id'] = ['Artist is already booked at {}.'.format(clash)]
+        if errors:
+            return errors
+        self.venues.add(show['venue_id'], show['start_time'])
+        self.artists.add(show['artist_id'], show['start_time'])
+        self._loaded.add((show['venue_id'], show['artist_id'], show['start_time']))
+        return None
+
+    def lock_rows(self, shows):
+        for model, key in self.lock:
+            ids = sorted({show[key] for show in shows})
+            self.session.query(model.id).filter(model.id.in_(ids)).order_by(model.id).with_for_update().all()
+
+    def __call__(self, shows):
+        """Check a batch; returns one errors dict (or None) per show."""
+        if shows:
+            self.lock_rows(shows)
+        self.prefetch(shows)
+        return [self.check(show) for show in shows]
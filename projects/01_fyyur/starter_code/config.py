@@ -6,5 +6,102 @@ basedir = os.path.abspath(os.path.dirname(__file__))
 # Enable debug mode.
 DEBUG = True
 
+# JSON request and error log, written by a background thread outside debug
+# mode: file rotation size and count, and how many records may wait in
+# memory before new ones are dropped
+LOG_FILE = os.environ.get('LOG_FILE', 'error.log')
+LOG_MAX_BYTES = 10 * 1024 * 1024
+LOG_BACKUP_COUNT = 5
+LOG_QUEUE_SIZE = 10000
+
 # Connect to the database
-SQLALCHEMY_DATABASE_URI = 'postgres://Josh@localhost:5432/fyyur'
+SQLALCHEMY_DATABASE_URI = os.environ.get('DATABASE_URL', 'postgres://Josh@localhost:5432/fyyur')
+SQLALCHEMY_TRACK_MODIFICATIONS = False
+
+# Connection pool of each database (primary and replica), per process.
+# Pre-ping tests connections on checkout so ones dropped by the server or a
+# proxy are replaced instead of failing a request. SQLite keeps
+# Flask-SQLAlchemy's own pooling.
+SQLALCHEMY_ENGINE_OPTIONS = {
+    'pool_pre_ping': os.environ.get('DB_POOL_PRE_PING', '1') != '0'
+}
+if not SQLALCHEMY_DATABASE_URI.startswith('sqlite'):
+    SQLALCHEMY_ENGINE_OPTIONS.update({
+        'pool_size': int(os.environ.get('DB_POOL_SIZE', 5)),
+        'max_overflow': int(os.environ.get('DB_MAX_OVERFLOW', 10)),
+        'pool_timeout': int(os.environ.get('DB_POOL_TIMEOUT', 30)),
+        'pool_recycle': int(os.environ.get('DB_POOL_RECYCLE', 1800))
+    })
+
+# Optional read replica for the listing, detail and search pages. After a
+# write, the same browser reads from the primary for REPLICA_STICKY_SECONDS
+# so it sees its own change despite replication lag.
+DATABASE_REPLICA_URL = os.environ.get('DATABASE_REPLICA_URL')
+SQLALCHEMY_BINDS = {'replica': DATABASE_REPLICA_URL} if DATABASE_REPLICA_URL else {}
+REPLICA_STICKY_SECONDS = 5
+
+# Number of shows listed per page on /shows
+SHOWS_PER_PAGE = 60
+
+# Number of upcoming and past shows listed on venue and artist pages
+DETAIL_SHOWS_LIMIT = 10
+
+# Maximum number of venue/artist search results, best matches first
+SEARCH_RESULTS_LIMIT = 50
+
+# Autocomplete prefix indexes: cap on indexed keys (one per word start) per
+# index, and how often each process reloads them from the database
+TYPEAHEAD_MAX_ENTRIES = 200000
+TYPEAHEAD_REFRESH_SECONDS = 300
+
+# Rendered fragment cache for /venues, /artists and /shows: memory budget,
+# and a TTL bounding how stale another process's cache can get
+FRAGMENT_CACHE_MAX_BYTES = 32 * 1024 * 1024
+FRAGMENT_CACHE_TTL = 60
+# Artists per cached block on /artists
+ARTIST_BLOCK_SIZE = 100
+
+# /shows/calendar: longest allowed window, and the cache for the named
+# windows (tonight, weekend)
+CALENDAR_MAX_DAYS = 92
+CALENDAR_CACHE_MAX_BYTES = 8 * 1024 * 1024
+CALENDAR_CACHE_TTL = 60
+
+# Shows archived or deleted per transaction when a venue or artist is archived
+ARCHIVE_BATCH_SIZE = 1000
+
+# How long a show holds its venue and artist; bookings closer together than
+# this are rejected as double bookings
+SHOW_DURATION_MINUTES = 180
+
+# /api/v1: rows per page unless the client asks for a limit, the largest
+# limit allowed, and included shows per venue or artist by default
+API_PAGE_SIZE = 20
+API_MAX_PAGE_SIZE = 100
+API_INCLUDE_LIMIT = 20
+
+# Most SQL queries a request to each endpoint should need. Requests over
+# budget are logged, or fail with QueryBudgetExceeded when
+# QUERY_BUDGET_MODE is 'raise' (useful in development and tests).
+QUERY_BUDGETS = {
+    'venues': 3,
+    'artists': 3,
+    'shows': 3,
+    'show_venue': 6,
+    'show_artist': 6,
+    'search_venues': 2,
+    'search_artists': 2,
+    'autocomplete_venues': 2,
+    'autocomplete_artists': 2,
+    'shows_calendar': 2,
+    'edit_venue': 2,
+    'edit_artist': 2,
+    # revisions, the page, one query per include
+    'api_v1.venues_list': 3,
+    'api_v1.venues_detail': 3,
+    'api_v1.artists_list': 3,
+    'api_v1.artists_detail': 3,
+    'api_v1.shows_list': 4,
+    'api_v1.shows_detail': 4
+}
+QUERY_BUDGET_MODE = os.environ.get('QUERY_BUDGET_MODE', 'log')
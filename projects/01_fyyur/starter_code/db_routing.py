@@ -0,0 +1,105 @@
+"""
+Connection pool instrumentation and read-replica routing.
+
+TimedQueuePool is a QueuePool that records how long each checkout waited
+for a connection, which is what tells whether pool_size/max_overflow are
+large enough. RoutingSession sends the reads of views that opted in (by
+setting g.read_replica) to the "replica" bind; flushes and insert, update
+and delete statements always go to the primary.
+"""
+import bisect
+import threading
+import time
+
+from flask import g, has_app_context
+from flask_sqlalchemy import SQLAlchemy, SignallingSession, get_state
+from sqlalchemy import exc, orm
+from sqlalchemy.pool import QueuePool
+from sqlalchemy.sql.dml import UpdateBase
+
+REPLICA_BIND = 'replica'
+
+# Upper bounds, in milliseconds, of the checkout wait histogram buckets
+WAIT_BUCKETS_MS = (1, 5, 10, 25, 50, 100, 250, 500, 1000, 5000)
+
+
+class WaitStats(object):
+
+    def __init__(self):
+        self.count = 0
+        self.timeouts = 0
+        self.total = 0.0
+        self.max = 0.0
+        self.buckets = [0] * (len(WAIT_BUCKETS_MS) + 1)
+        self._lock = threading.Lock()
+
+    def record(self, seconds):
+        ms = seconds * 1000
+        with self._lock:
+            self.count += 1
+            self.total += ms
+            self.max = max(self.max, ms)
+            self.buckets[bisect.bisect_left(WAIT_BUCKETS_MS, ms)] += 1
+
+    def snapshot(self):
+        with self._lock:
+            labels = ['le_{}ms'.format(bound) for bound in WAIT_BUCKETS_MS] + ['inf']
+            return {
+                "checkouts": self.count,
+                "timeouts": self.timeouts,
+                "wait_ms_avg": round(self.total / self.count, 3) if self.count else None,
+                "wait_ms_max": round(self.max, 3),
+                "wait_ms_histogram": dict(zip(labels, self.buckets))
+            }
+
+
+class TimedQueuePool(QueuePool):
+
+    def __init__(self, *args, **kwargs):
+        super(TimedQueuePool, self).__init__(*args, **kwargs)
+        self.wait_stats = WaitStats()
+
+    def _do_get(self):
+        started = time.perf_counter()
+        try:
+            return super(TimedQueuePool, self)._do_get()
+        except exc.TimeoutError:
+            self.wait_stats.timeouts += 1
+            raise
+        finally:
+            self.wait_stats.record(time.perf_counter() - started)
+
+
+def pool_status(engine):
+    """Occupancy and checkout wait statistics of engine's pool."""
+    pool = engine.pool
+    status = {"pool": type(pool).__name__}
+    if isinstance(pool, QueuePool):
+        status.update({
+            "size": pool.size(),
+            "checked_in": pool.checkedin(),
+            "checked_out": pool.checkedout(),
+            "overflow": pool.overflow(),
+            "timeout": pool.timeout()
+        })
+    if isinstance(pool, TimedQueuePool):
+        status.update(pool.wait_stats.snapshot())
+    return status
+
+
+class RoutingSession(SignallingSession):
+
+    def get_bind(self, mapper=None, clause=None, **kwargs):
+        if not self._flushing and not isinstance(clause, UpdateBase) and self.use_replica():
+            return get_state(self.app).db.get_engine(self.app, bind=REPLICA_BIND)
+        return super(RoutingSession, self).get_bind(mapper, clause)
+
+    def use_replica(self):
+        return has_app_context() and g.get('read_replica', False) and \
+            REPLICA_BIND in (self.app.config.get('SQLALCHEMY_BINDS') or {})
+
+
+class RoutingSQLAlchemy(SQLAlchemy):
+
+    def create_session(self, options):
+        return orm.sessionmaker(class_=RoutingSession, db=self, **options)
@@ -0,0 +1,119 @@
+"""
+In-process cache for rendered HTML fragments of the listing pages.
+
+Entries are kept in LRU order under a byte budget and carry tags; writers
+invalidate by tag (an area, an artist, "shows", ...) so only the fragments
+that show the changed rows are re-rendered. Each process has its own
+cache, so entries also expire after a TTL to bound how long a write made
+through another process can go unseen.
+"""
+import sys
+import threading
+import time
+from collections import OrderedDict, defaultdict
+
+from markupsafe import Markup
+
+
+def _sizeof(value):
+    if isinstance(value, (list, tuple)):
+        return sys.getsizeof(value) + sum(_sizeof(item) for item in value)
+    return sys.getsizeof(value)
+
+
+class FragmentCache(object):
+
+    def __init__(self, max_bytes=32 * 1024 * 1024, ttl=None):
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.size = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+        self._entries = OrderedDict()   # key -> (value, size, tags, expires)
+        self._tags = defaultdict(set)   # tag -> keys
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[3] is not None and entry[3] < time.monotonic():
+                self._discard(key)
+                entry = None
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[0]
+
+    def set(self, key, value, tags=()):
+        """Cache value (a fragment, or a small list of keys) and return it."""
+        size = _sizeof(value)
+        if size > self.max_bytes:
+            return value
+        expires = time.monotonic() + self.ttl if self.ttl else None
+        tags = frozenset(tags) | {key}
+        with self._lock:
+            self._discard(key)
+            self._entries[key] = (value, size, tags, expires)
+            self.size += size
+            for tag in tags:
+                self._tags[tag].add(key)
+            while self.size > self.max_bytes:
+                self._discard(next(iter(self._entries)))
+                self.evictions += 1
+        return value
+
+    def capture(self, key, chunks, tags=(), wrap=Markup):
+        """
+        Pass rendered chunks through while collecting them, and cache the
+        whole fragment once the stream is complete. tags may be a callable,
+        evaluated after the last chunk. Chunks are wrapped as Markup unless
+        wrap is None.
+        """
+        wrap = wrap or str
+        collected = []
+        for chunk in chunks:
+            collected.append(chunk)
+            yield wrap(chunk)
+        self.set(key, wrap(''.join(collected)), tags() if callable(tags) else tags)
+
+    def invalidate(self, *tags):
+        with self._lock:
+            for tag in tags:
+                for key in list(self._tags.get(tag, ())):
+                    self._discard(key)
+                    self.invalidations += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._tags.clear()
+            self.size = 0
+
+    def _discard(self, key):
+        entry = self._entries.pop(key, None)
+        if entry is None:
+            return
+        self.size -= entry[1]
+        for tag in entry[2]:
+            keys = self._tags.get(tag)
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del self._tags[tag]
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "bytes": self.size,
+            "max_bytes": self.max_bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else None,
+            "evictions": self.evictions,
+            "invalidations": self.invalidations
+        }
@@ -0,0 +1,224 @@
+"""
+Streaming bulk import of venues, artists and shows.
+
+Rows are read lazily from CSV (header row required) or JSON Lines files,
+validated with the same WTForms classes as the web forms, and inserted in
+batches with one executemany (or PostgreSQL COPY) and one commit per
+batch. After each commit the last imported line number is written to a
+checkpoint file next to the input, so an interrupted import can resume
+where it stopped. Rejected rows are written, with their errors, to a
+.rejects.jsonl file next to the input.
+
+Checks that need a whole batch at once (show double bookings) run through
+the optional check_batch hook just before each insert. A dry run validates
+and checks everything but writes nothing to the database.
+"""
+import csv
+import io
+import json
+import os
+
+from werkzeug.datastructures import MultiDict
+
+
+def read_rows(path):
+    """Yield (line number, row dict) pairs from a .csv or .jsonl file."""
+    with open(path, newline='', encoding='utf-8') as f:
+        if path.endswith(('.jsonl', '.ndjson')):
+            for line_number, line in enumerate(f, 1):
+                if line.strip():
+                    yield line_number, json.loads(line)
+        else:
+            reader = csv.DictReader(f)
+            for row in reader:
+                yield reader.line_num, row
+
+
+def array_literal(values):
+    # COPY takes arrays in their PostgreSQL text form.
+    quoted = ('"{}"'.format(str(v).replace('\\', '\\\\').replace('"', '\\"')) for v in values)
+    return '{' + ','.join(quoted) + '}'
+
+
+class FormValidator(object):
+    """Validate a row with a form class and map it to column values."""
+
+    def __init__(self, form_class, columns, list_fields=('genres',)):
+        self.form_class = form_class
+        self.columns = columns
+        self.list_fields = list_fields
+
+    def formdata(self, row):
+        formdata = MultiDict()
+        for key, value in row.items():
+            if value is None:
+                continue
+            if key in self.list_fields:
+                if isinstance(value, str):
+                    value = [v.strip() for v in value.split(',') if v.strip()]
+                formdata.setlist(key, [str(v) for v in value])
+            else:
+                formdata[key] = str(value)
+        return formdata
+
+    def __call__(self, row):
+        form = self.form_class(formdata=self.formdata(row), meta={'csrf': False})
+        if not form.validate():
+            return None, form.errors
+        values = {column: form[column].data for column in self.columns if column in form}
+        return values, None
+
+
+class ForeignKeyResolver(object):
+    """
+    In-memory lookup of a referenced table, by id or by (unique) name, so
+    show rows can be checked without a query per row. Archived rows are
+    left out.
+    """
+
+    def __init__(self, session, model):
+        self.ids = set()
+        self.by_name = {}
+        rows = session.query(model.id, model.name).filter(model.archived_at.is_(None))
+        for item_id, name in rows.yield_per(10000):
+            self.ids.add(item_id)
+            # Ambiguous names resolve to None and are rejected.
+            self.by_name[name] = None if name in self.by_name else item_id
+
+    def resolve(self, item_id, name):
+        if item_id not in (None, ''):
+            try:
+                item_id = int(item_id)
+            except (TypeError, ValueError):
+                return None
+            return item_id if item_id in self.ids else None
+        return self.by_name.get(name)
+
+
+class ShowValidator(FormValidator):
+
+    def __init__(self, form_class, columns, venues, artists):
+        super(ShowValidator, self).__init__(form_class, columns, list_fields=())
+        self.venues = venues
+        self.artists = artists
+
+    def __call__(self, row):
+        values, errors = super(ShowValidator, self).__call__(row)
+        if errors:
+            return None, errors
+        errors = {}
+        values['venue_id'] = self.venues.resolve(row.get('venue_id'), row.get('venue_name'))
+        if values['venue_id'] is None:
+            errors['venue_id'] = ['Unknown venue.']
+        values['artist_id'] = self.artists.resolve(row.get('artist_id'), row.get('artist_name'))
+        if values['artist_id'] is None:
+            errors['artist_id'] = ['Unknown artist.']
+        return (None, errors) if errors else (values, None)
+
+
+class BulkImporter(object):
+
+    def __init__(self, session, table, validate, batch_size=1000, use_copy=False, progress=None,
+                 check_batch=None, dry_run=False):
+        self.session = session
+        self.table = table
+        self.validate = validate
+        self.batch_size = batch_size
+        self.use_copy = use_copy
+        self.progress = progress
+        # check_batch(list of values) -> list of errors dicts (or None), one per row
+        self.check_batch = check_batch
+        self.dry_run = dry_run
+        self.stats = {"read": 0, "inserted": 0, "rejected": 0, "skipped": 0, "line": 0}
+
+    @staticmethod
+    def checkpoint_path(path):
+        return path + '.checkpoint'
+
+    def load_checkpoint(self, path):
+        try:
+            with open(self.checkpoint_path(path)) as f:
+                return json.load(f)['line']
+        except (IOError, ValueError, KeyError):
+            return 0
+
+    def save_checkpoint(self, path, line):
+        tmp = self.checkpoint_path(path) + '.tmp'
+        with open(tmp, 'w') as f:
+            json.dump({"table": self.table.name, "line": line}, f)
+        os.replace(tmp, self.checkpoint_path(path))
+
+    def run(self, path, resume=False):
+        """Import path; returns the stats dict."""
+        start_after = self.load_checkpoint(path) if resume else 0
+        batch = []
+        with open(path + '.rejects.jsonl', 'a' if resume else 'w') as rejects:
+            for line_number, row in read_rows(path):
+                if line_number <= start_after:
+                    self.stats['skipped'] += 1
+                    continue
+                self.stats['read'] += 1
+                values, errors = self.validate(row)
+                if errors:
+                    self.reject(rejects, line_number, row, errors)
+                else:
+                    batch.append((line_number, row, values))
+                if len(batch) >= self.batch_size:
+                    self.flush(path, batch, line_number, rejects)
+                    batch = []
+                self.stats['line'] = line_number
+            self.flush(path, batch, self.stats['line'], rejects)
+        if not self.dry_run and os.path.exists(self.checkpoint_path(path)):
+            os.remove(self.checkpoint_path(path))
+        return self.stats
+
+    def reject(self, rejects, line_number, row, errors):
+        self.stats['rejected'] += 1
+        rejects.write(json.dumps({"line": line_number, "errors": errors, "row": row}) + '\n')
+
+    def flush(self, path, batch, line_number, rejects):
+        if batch and self.check_batch:
+            checked = self.check_batch([values for _, _, values in batch])
+            accepted = []
+            for (row_line, row, values), errors in zip(batch, checked):
+                if errors:
+                    self.reject(rejects, row_line, row, errors)
+                else:
+                    accepted.append((row_line, row, values))
+            batch = accepted
+        if batch and not self.dry_run:
+            values = [values for _, _, values in batch]
+            if self.use_copy:
+                self.copy(values)
+            else:
+                self.session.execute(self.table.insert(), values)
+            self.session.commit()
+        self.stats['inserted'] += len(batch)
+        # Rejected-only stretches still move the checkpoint forward.
+        if line_number and not self.dry_run:
+            self.save_checkpoint(path, line_number)
+        if self.progress:
+            self.progress(self.stats)
+
+    def copy(self, batch):
+        columns = list(batch[0].keys())
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        for values in batch:
+            writer.writerow([
+                '' if values[c] is None else
+                array_literal(values[c]) if isinstance(values[c], list) else values[c]
+                for c in columns
+            ])
+        buffer.seek(0)
+        connection = self.session.connection()
+        # COPY bypasses statement events, so flag the table as written for
+        # the app's revision tracking by hand.
+        connection.info.setdefault('written_tables', set()).add(self.table.name)
+        cursor = connection.connection.cursor()
+        cursor.copy_expert(
+            'COPY "{}" ({}) FROM STDIN WITH (FORMAT csv)'.format(
+                self.table.name, ', '.join('"{}"'.format(c) for c in columns)
+            ),
+            buffer
+        )
@@ -0,0 +1,166 @@
+"""
+Request latency and SQL query metrics, in Prometheus text format.
+
+Engine events count and time every statement executed while a request is
+being handled; request hooks time each request until its response has been
+sent (streamed pages included) and record, per endpoint, a latency
+histogram and a histogram of queries per request.
+
+Endpoints can be given a query budget. A request that runs more queries
+than its endpoint's budget is logged, or, in "raise" mode, fails with
+QueryBudgetExceeded at the first query over budget, which makes N+1
+regressions fail loudly in development and tests.
+"""
+import bisect
+import threading
+import time
+from collections import defaultdict
+
+from flask import g, has_request_context, request
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+QUERY_COUNT_BUCKETS = (0, 1, 2, 3, 5, 10, 20, 50, 100, 1000)
+
+
+class QueryBudgetExceeded(Exception):
+    pass
+
+
+class Histogram(object):
+
+    def __init__(self, buckets):
+        self.bounds = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0
+        self.count = 0
+
+    def observe(self, value):
+        self.counts[bisect.bisect_left(self.bounds, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def lines(self, name, labels):
+        """Prometheus _bucket/_sum/_count lines; buckets are cumulative."""
+        cumulative = 0
+        for bound, count in zip(list(self.bounds) + ['+Inf'], self.counts):
+            cumulative += count
+            yield '{}_bucket{} {}'.format(name, format_labels(labels, le=bound), cumulative)
+        yield '{}_sum{} {}'.format(name, format_labels(labels), round(self.sum, 6))
+        yield '{}_count{} {}'.format(name, format_labels(labels), self.count)
+
+
+def format_labels(labels, **extra):
+    items = list(labels.items()) + list(extra.items())
+    if not items:
+        return ''
+    escaped = ('{}="{}"'.format(k, str(v).replace('\\', '\\\\').replace('"', '\\"')) for k, v in items)
+    return '{' + ','.join(escaped) + '}'
+
+
+class RequestMetrics(object):
+
+    def __init__(self, app=None, prefix='fyyur'):
+        self.prefix = prefix
+        self.latency = defaultdict(lambda: Histogram(LATENCY_BUCKETS))
+        self.queries = defaultdict(lambda: Histogram(QUERY_COUNT_BUCKETS))
+        self.query_seconds = defaultdict(float)
+        self.responses = defaultdict(int)          # (endpoint, status) -> count
+        self.over_budget = defaultdict(int)
+        self._lock = threading.Lock()
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        self.app = app
+        app.config.setdefault('QUERY_BUDGETS', {})
+        app.config.setdefault('QUERY_BUDGET_MODE', 'log')
+        app.before_request(self.start_request)
+        app.after_request(self.finish_request)
+        event.listen(Engine, 'before_cursor_execute', self.before_cursor_execute)
+        event.listen(Engine, 'after_cursor_execute', self.after_cursor_execute)
+        app.extensions['metrics'] = self
+
+    def start_request(self):
+        g.request_metrics = {
+            'started': time.perf_counter(),
+            'endpoint': request.endpoint or 'unmatched',
+            'queries': 0,
+            'query_seconds': 0.0,
+            'budget': self.app.config['QUERY_BUDGETS'].get(request.endpoint)
+        }
+
+    def finish_request(self, response):
+        stats = g.get('request_metrics')
+        if stats is not None:
+            status = response.status_code
+            # Streamed pages keep querying after this hook.
+            response.call_on_close(lambda: self.record(stats, status))
+        return response
+
+    def before_cursor_execute(self, conn, cursor, statement, parameters, context, executemany):
+        conn.info['query_started'] = time.perf_counter()
+
+    def after_cursor_execute(self, conn, cursor, statement, parameters, context, executemany):
+        elapsed = time.perf_counter() - conn.info.pop('query_started', time.perf_counter())
+        stats = g.get('request_metrics') if has_request_context() else None
+        if stats is None:
+            return
+        stats['queries'] += 1
+        stats['query_seconds'] += elapsed
+        budget = stats['budget']
+        if budget is not None and stats['queries'] > budget and \
+                self.app.config['QUERY_BUDGET_MODE'] == 'raise':
+            raise QueryBudgetExceeded('{} ran more than {} queries'.format(stats['endpoint'], budget))
+
+    def record(self, stats, status):
+        endpoint = stats['endpoint']
+        elapsed = time.perf_counter() - stats['started']
+        with self._lock:
+            self.latency[endpoint].observe(elapsed)
+            self.queries[endpoint].observe(stats['queries'])
+            self.query_seconds[endpoint] += stats['query_seconds']
+            self.responses[endpoint, status] += 1
+            over = stats['budget'] is not None and stats['queries'] > stats['budget']
+            if over:
+                self.over_budget[endpoint] += 1
+        if over:
+            self.app.logger.warning(
+                'query budget exceeded: %s ran %d queries (budget %d)',
+                endpoint, stats['queries'], stats['budget']
+            )
+
+    def render(self, gauges=()):
+        """
+        Prometheus exposition text. gauges are extra (name, labels, value)
+        samples, e.g. connection pool occupancy.
+        """
+        p = self.prefix
+        lines = []
+        with self._lock:
+            lines.append('# TYPE {}_request_duration_seconds histogram'.format(p))
+            for endpoint, histogram in sorted(self.latency.items()):
+                lines.extend(histogram.lines(p + '_request_duration_seconds', {'endpoint': endpoint}))
+            lines.append('# TYPE {}_request_queries histogram'.format(p))
+            for endpoint, histogram in sorted(self.queries.items()):
+                lines.extend(histogram.lines(p + '_request_queries', {'endpoint': endpoint}))
+            lines.append('# TYPE {}_request_query_seconds_total counter'.format(p))
+            for endpoint, seconds in sorted(self.query_seconds.items()):
+                lines.append('{}_request_query_seconds_total{} {}'.format(
+                    p, format_labels({'endpoint': endpoint}), round(seconds, 6)))
+            lines.append('# TYPE {}_responses_total counter'.format(p))
+            for (endpoint, status), count in sorted(self.responses.items()):
+                lines.append('{}_responses_total{} {}'.format(
+                    p, format_labels({'endpoint': endpoint, 'status': status}), count))
+            lines.append('# TYPE {}_query_budget_exceeded_total counter'.format(p))
+            for endpoint, count in sorted(self.over_budget.items()):
+                lines.append('{}_query_budget_exceeded_total{} {}'.format(
+                    p, format_labels({'endpoint': endpoint}), count))
+        typed = set()
+        for name, labels, value in gauges:
+            if name not in typed:
+                typed.add(name)
+                lines.append('# TYPE {}_{} gauge'.format(p, name))
+            lines.append('{}_{}{} {}'.format(p, name, format_labels(labels), value))
+        return '\n'.join(lines) + '\n'
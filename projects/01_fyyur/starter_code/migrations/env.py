@@ -5,6 +5,7 @@ from logging.config import fileConfig
 
 from sqlalchemy import engine_from_config
 from sqlalchemy import pool
+from sqlalchemy import text
 
 from alembic import context
 
@@ -32,6 +33,13 @@ target_metadata = current_app.extensions['migrate'].db.metadata
 # my_important_option = config.get_main_option("my_important_option")
 # ... etc.
 
+# PostgreSQL timeouts for running against a live database, e.g.
+#   flask db upgrade -x lock_timeout=5s -x statement_timeout=0
+# lock_timeout makes a migration give up instead of queueing behind a long
+# transaction while every later query on the table queues behind it.
+x_args = context.get_x_argument(as_dictionary=True)
+SESSION_SETTINGS = ('lock_timeout', 'statement_timeout')
+
 
 def run_migrations_offline():
     """Run migrations in 'offline' mode.
@@ -47,7 +55,8 @@ def run_migrations_offline():
     """
     url = config.get_main_option("sqlalchemy.url")
     context.configure(
-        url=url, target_metadata=target_metadata, literal_binds=True
+        url=url, target_metadata=target_metadata, literal_binds=True,
+        transaction_per_migration=True
     )
 
     with context.begin_transaction():
@@ -79,10 +88,22 @@ def run_migrations_online():
     )
 
     with connectable.connect() as connection:
+        if connection.dialect.name == 'postgresql':
+            for setting in SESSION_SETTINGS:
+                if setting in x_args:
+                    connection.execute(
+                        text('SELECT set_config(:setting, :value, false)'),
+                        {'setting': setting, 'value': x_args[setting]}
+                    )
+
+        # One transaction per migration, so migrations can leave theirs
+        # (op.get_context().autocommit_block()) for CREATE INDEX CONCURRENTLY
+        # and a failure only rolls back the migration that failed.
         context.configure(
             connection=connection,
             target_metadata=target_metadata,
             process_revision_directives=process_revision_directives,
+            transaction_per_migration=True,
             **current_app.extensions['migrate'].configure_args
         )
 
@@ -0,0 +1,29 @@
+"""index Venue by city and state
+
+Revision ID: 2b8d6e1f0a37
+Revises: f1c7a2d95e63
+Create Date: 2026-10-18 14:02:16.448390
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '2b8d6e1f0a37'
+down_revision = 'f1c7a2d95e63'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Built concurrently, see 8c1f2d7a9b40.
+    with op.get_context().autocommit_block():
+        op.drop_index('ix_Venue_city_state', table_name='Venue', if_exists=True, postgresql_concurrently=True)
+        op.create_index('ix_Venue_city_state', 'Venue', ['city', 'state'], unique=False,
+                        postgresql_concurrently=True)
+
+
+def downgrade():
+    with op.get_context().autocommit_block():
+        op.drop_index('ix_Venue_city_state', table_name='Venue', postgresql_concurrently=True)
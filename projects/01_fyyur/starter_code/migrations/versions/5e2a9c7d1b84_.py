@@ -0,0 +1,29 @@
+"""index Show by start time for the show listing and calendar
+
+Revision ID: 5e2a9c7d1b84
+Revises: 2b8d6e1f0a37
+Create Date: 2026-10-18 16:40:09.218734
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '5e2a9c7d1b84'
+down_revision = '2b8d6e1f0a37'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Built concurrently, see 8c1f2d7a9b40.
+    with op.get_context().autocommit_block():
+        op.drop_index('ix_Show_start_time_id', table_name='Show', if_exists=True, postgresql_concurrently=True)
+        op.create_index('ix_Show_start_time_id', 'Show', ['start_time', 'id'], unique=False,
+                        postgresql_concurrently=True)
+
+
+def downgrade():
+    with op.get_context().autocommit_block():
+        op.drop_index('ix_Show_start_time_id', table_name='Show', postgresql_concurrently=True)
@@ -0,0 +1,38 @@
+"""index Show by venue and artist start time
+
+Revision ID: 8c1f2d7a9b40
+Revises: 3a206bce5fd0
+Create Date: 2026-10-18 09:12:41.520318
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '8c1f2d7a9b40'
+down_revision = '3a206bce5fd0'
+branch_labels = None
+depends_on = None
+
+
+INDEXES = (
+    ('ix_Show_venue_id_start_time', ['venue_id', 'start_time']),
+    ('ix_Show_artist_id_start_time', ['artist_id', 'start_time']),
+)
+
+
+def upgrade():
+    # Built concurrently outside a transaction so writes to Show continue.
+    # A failed concurrent build leaves an invalid index behind, which is
+    # dropped before retrying.
+    with op.get_context().autocommit_block():
+        for name, columns in INDEXES:
+            op.drop_index(name, table_name='Show', if_exists=True, postgresql_concurrently=True)
+            op.create_index(name, 'Show', columns, unique=False, postgresql_concurrently=True)
+
+
+def downgrade():
+    with op.get_context().autocommit_block():
+        for name, columns in reversed(INDEXES):
+            op.drop_index(name, table_name='Show', postgresql_concurrently=True)
@@ -0,0 +1,80 @@
+"""add search indexes for Venue and Artist
+
+Revision ID: b72e5c0d4f19
+Revises: 8c1f2d7a9b40
+Create Date: 2026-10-18 10:03:27.114902
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'b72e5c0d4f19'
+down_revision = '8c1f2d7a9b40'
+branch_labels = None
+depends_on = None
+
+# The search expression as of this revision; frozen here, as later
+# revisions change search.TSVECTOR_SQL (see f1c7a2d95e63).
+TSVECTOR_SQL = (
+    "to_tsvector('simple', coalesce(name, '') || ' ' || "
+    "coalesce(city, '') || ' ' || coalesce(genres, ''))"
+)
+TABLES = ('Venue', 'Artist')
+
+
+def upgrade():
+    dialect = op.get_bind().dialect.name
+    if dialect == 'postgresql':
+        op.execute('CREATE EXTENSION IF NOT EXISTS pg_trgm')
+        # Built concurrently, see 8c1f2d7a9b40.
+        with op.get_context().autocommit_block():
+            for table in TABLES:
+                op.execute('DROP INDEX CONCURRENTLY IF EXISTS "ix_{0}_name_trgm"'.format(table))
+                op.execute(
+                    'CREATE INDEX CONCURRENTLY "ix_{0}_name_trgm" ON "{0}" '
+                    'USING gin (name gin_trgm_ops)'.format(table)
+                )
+                op.execute('DROP INDEX CONCURRENTLY IF EXISTS "ix_{0}_search"'.format(table))
+                op.execute(
+                    'CREATE INDEX CONCURRENTLY "ix_{0}_search" ON "{0}" '
+                    'USING gin ({1})'.format(table, TSVECTOR_SQL)
+                )
+    elif dialect == 'sqlite':
+        for table in TABLES:
+            op.execute(
+                'CREATE VIRTUAL TABLE "{0}_fts" USING fts5('
+                'name, city, genres, content=\'{0}\', content_rowid=\'id\')'.format(table)
+            )
+            op.execute(
+                'CREATE TRIGGER "{0}_fts_insert" AFTER INSERT ON "{0}" BEGIN '
+                'INSERT INTO "{0}_fts"(rowid, name, city, genres) '
+                'VALUES (new.id, new.name, new.city, new.genres); END'.format(table)
+            )
+            op.execute(
+                'CREATE TRIGGER "{0}_fts_delete" AFTER DELETE ON "{0}" BEGIN '
+                'INSERT INTO "{0}_fts"("{0}_fts", rowid, name, city, genres) '
+                'VALUES (\'delete\', old.id, old.name, old.city, old.genres); END'.format(table)
+            )
+            op.execute(
+                'CREATE TRIGGER "{0}_fts_update" AFTER UPDATE ON "{0}" BEGIN '
+                'INSERT INTO "{0}_fts"("{0}_fts", rowid, name, city, genres) '
+                'VALUES (\'delete\', old.id, old.name, old.city, old.genres); '
+                'INSERT INTO "{0}_fts"(rowid, name, city, genres) '
+                'VALUES (new.id, new.name, new.city, new.genres); END'.format(table)
+            )
+            op.execute('INSERT INTO "{0}_fts"("{0}_fts") VALUES (\'rebuild\')'.format(table))
+
+
+def downgrade():
+    dialect = op.get_bind().dialect.name
+    if dialect == 'postgresql':
+        for table in TABLES:
+            op.execute('DROP INDEX IF EXISTS "ix_{0}_search"'.format(table))
+            op.execute('DROP INDEX IF EXISTS "ix_{0}_name_trgm"'.format(table))
+    elif dialect == 'sqlite':
+        for table in TABLES:
+            for trigger in ('insert', 'delete', 'update'):
+                op.execute('DROP TRIGGER IF EXISTS "{0}_fts_{1}"'.format(table, trigger))
+            op.execute('DROP TABLE IF EXISTS "{0}_fts"'.format(table))
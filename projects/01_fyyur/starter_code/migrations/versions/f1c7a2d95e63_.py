@@ -0,0 +1,138 @@
+"""store Venue and Artist genres as an indexed array
+
+Revision ID: f1c7a2d95e63
+Revises: d4a9e3b6c218
+Create Date: 2026-10-18 13:21:48.903156
+
+"""
+import json
+import re
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision = 'f1c7a2d95e63'
+down_revision = 'd4a9e3b6c218'
+branch_labels = None
+depends_on = None
+
+TABLES = ('Venue', 'Artist')
+
+# The expression indexed by b72e5c0d4f19, restored on downgrade; frozen.
+OLD_TSVECTOR_SQL = (
+    "to_tsvector('simple', coalesce(name, '') || ' ' || "
+    "coalesce(city, '') || ' ' || coalesce(genres, ''))"
+)
+# Keep in sync with search.TSVECTOR_SQL / search.GENRES_TEXT_FUNCTION_SQL.
+TSVECTOR_SQL = (
+    "to_tsvector('simple', coalesce(name, '') || ' ' || "
+    "coalesce(city, '') || ' ' || fyyur_genres_text(genres))"
+)
+GENRES_TEXT_FUNCTION_SQL = (
+    "CREATE OR REPLACE FUNCTION fyyur_genres_text(varchar[]) RETURNS text "
+    "LANGUAGE sql IMMUTABLE AS $$ SELECT coalesce(array_to_string($1, ' '), '') $$"
+)
+
+# Existing values are either array literals written by the old handlers
+# ('{Jazz,"Rock n Roll"}') or plain comma separated text.
+TO_ARRAY_SQL = (
+    "CASE WHEN genres IS NULL OR genres = '' THEN NULL "
+    "WHEN genres LIKE '{%}' THEN genres::varchar(120)[] "
+    "ELSE regexp_split_to_array(trim(genres), '\\s*,\\s*')::varchar(120)[] END"
+)
+
+
+def _parse(value):
+    if not value:
+        return None
+    if value.startswith('{') and value.endswith('}'):
+        return [g.strip('"') for g in re.findall(r'"(?:[^"\\]|\\.)*"|[^,{}]+', value[1:-1])]
+    return [g.strip() for g in value.split(',') if g.strip()]
+
+
+def _is_array(bind, table):
+    # Lets a run interrupted after the type change was committed (while the
+    # indexes were building) be repeated.
+    return bind.execute(sa.text(
+        "SELECT data_type FROM information_schema.columns "
+        "WHERE table_name = :table AND column_name = 'genres'"
+    ), {'table': table}).scalar() == 'ARRAY'
+
+
+def upgrade():
+    bind = op.get_bind()
+    if bind.dialect.name != 'postgresql':
+        # SQLite keeps the list as JSON text in the same column.
+        for table in TABLES:
+            rows = bind.execute(sa.text('SELECT id, genres FROM "{}"'.format(table))).fetchall()
+            for row_id, genres in rows:
+                bind.execute(
+                    sa.text('UPDATE "{}" SET genres = :genres WHERE id = :id'.format(table)),
+                    {'genres': json.dumps(_parse(genres)), 'id': row_id}
+                )
+        return
+
+    op.execute(GENRES_TEXT_FUNCTION_SQL)
+    # The type change has to rewrite the tables under an exclusive lock.
+    # The search index is dropped first so it is not rebuilt under that
+    # lock, and both GIN indexes are built concurrently once the change has
+    # committed, see 8c1f2d7a9b40.
+    with op.get_context().autocommit_block():
+        for table in TABLES:
+            op.execute('DROP INDEX CONCURRENTLY IF EXISTS "ix_{}_search"'.format(table))
+    for table in TABLES:
+        if _is_array(bind, table):
+            continue
+        op.alter_column(
+            table, 'genres',
+            existing_type=sa.String(length=120),
+            type_=postgresql.ARRAY(sa.String(length=120)),
+            postgresql_using=TO_ARRAY_SQL
+        )
+    with op.get_context().autocommit_block():
+        for table in TABLES:
+            op.execute('DROP INDEX CONCURRENTLY IF EXISTS "ix_{}_genres"'.format(table))
+            op.create_index(
+                'ix_{}_genres'.format(table), table, ['genres'],
+                postgresql_using='gin', postgresql_concurrently=True
+            )
+            op.execute('CREATE INDEX CONCURRENTLY "ix_{0}_search" ON "{0}" USING gin ({1})'.format(
+                table, TSVECTOR_SQL
+            ))
+
+
+def downgrade():
+    bind = op.get_bind()
+    if bind.dialect.name != 'postgresql':
+        for table in TABLES:
+            rows = bind.execute(sa.text('SELECT id, genres FROM "{}"'.format(table))).fetchall()
+            for row_id, genres in rows:
+                bind.execute(
+                    sa.text('UPDATE "{}" SET genres = :genres WHERE id = :id'.format(table)),
+                    {'genres': ','.join(json.loads(genres)) if genres else None, 'id': row_id}
+                )
+        return
+
+    with op.get_context().autocommit_block():
+        for table in TABLES:
+            op.execute('DROP INDEX CONCURRENTLY IF EXISTS "ix_{}_search"'.format(table))
+            op.execute('DROP INDEX CONCURRENTLY IF EXISTS "ix_{}_genres"'.format(table))
+    for table in TABLES:
+        if not _is_array(bind, table):
+            continue
+        op.alter_column(
+            table, 'genres',
+            existing_type=postgresql.ARRAY(sa.String(length=120)),
+            type_=sa.String(length=120),
+            postgresql_using="array_to_string(genres, ',')"
+        )
+    with op.get_context().autocommit_block():
+        for table in TABLES:
+            op.execute('DROP INDEX CONCURRENTLY IF EXISTS "ix_{}_search"'.format(table))
+            op.execute('CREATE INDEX CONCURRENTLY "ix_{0}_search" ON "{0}" USING gin ({1})'.format(
+                table, OLD_TSVECTOR_SQL
+            ))
+    op.execute('DROP FUNCTION IF EXISTS fyyur_genres_text(varchar[])')
@@ -0,0 +1,156 @@
+"""
+Queue-backed JSON logging with a per-request id and duration.
+
+Request threads only put records on a bounded in-memory queue; a
+QueueListener thread formats them as JSON lines and writes them to a
+size-rotated file. When the queue is full records are dropped rather than
+blocking the request, and the number dropped is logged once there is room
+again.
+
+Every request gets an id (the incoming X-Request-ID header, or a new one),
+which is echoed in the response and attached to every record logged while
+handling it. One access record per request is logged when the response has
+been sent, with its status and duration.
+"""
+import atexit
+import copy
+import json
+import logging
+import queue
+import threading
+import time
+import uuid
+from datetime import datetime, timezone
+from logging.handlers import QueueHandler, QueueListener, RotatingFileHandler
+
+from flask import g, has_request_context, request
+from flask.logging import default_handler
+
+# Fields copied from records into the JSON line when present
+EXTRA_FIELDS = ('request_id', 'method', 'path', 'status', 'duration_ms', 'remote_addr')
+
+
+class JsonFormatter(logging.Formatter):
+
+    def format(self, record):
+        line = {
+            "time": datetime.fromtimestamp(record.created, timezone.utc).isoformat(timespec='milliseconds'),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage()
+        }
+        for field in EXTRA_FIELDS:
+            value = getattr(record, field, None)
+            if value is not None:
+                line[field] = value
+        if record.exc_info:
+            line["exception"] = self.formatException(record.exc_info)
+        elif record.exc_text:
+            line["exception"] = record.exc_text
+        return json.dumps(line, default=str)
+
+
+class DroppingQueueHandler(QueueHandler):
+    """QueueHandler that never blocks: records that do not fit are counted and dropped."""
+
+    def __init__(self, log_queue):
+        super(DroppingQueueHandler, self).__init__(log_queue)
+        self.dropped = 0
+        self._unreported = 0
+        self._lock = threading.Lock()
+
+    def prepare(self, record):
+        # Resolve the message and traceback here, so the listener thread
+        # never touches request-thread objects.
+        record = copy.copy(record)
+        record.msg = record.getMessage()
+        record.args = None
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        if has_request_context() and getattr(record, 'request_id', None) is None:
+            record.request_id = g.get('request_id')
+        return record
+
+    def enqueue(self, record):
+        with self._lock:
+            unreported = self._unreported
+        if unreported and self._put(self.dropped_record(unreported)):
+            with self._lock:
+                self._unreported -= unreported
+        if not self._put(record):
+            with self._lock:
+                self.dropped += 1
+                self._unreported += 1
+
+    def _put(self, record):
+        try:
+            self.queue.put_nowait(record)
+            return True
+        except queue.Full:
+            return False
+
+    def dropped_record(self, count):
+        return logging.makeLogRecord({
+            'name': __name__, 'levelno': logging.WARNING, 'levelname': 'WARNING',
+            'msg': '{} log records dropped, queue full'.format(count)
+        })
+
+
+class DrainingQueueListener(QueueListener):
+
+    def enqueue_sentinel(self):
+        # The queue may be full at shutdown: wait for room rather than fail.
+        self.queue.put(self._sentinel)
+
+    def stop(self):
+        if self._thread is not None:
+            super(DrainingQueueListener, self).stop()
+
+
+def init_logging(app):
+    """Send app.logger and access records through a queue to a rotating JSON log."""
+    config = app.config
+    log_queue = queue.Queue(maxsize=config['LOG_QUEUE_SIZE'])
+    file_handler = RotatingFileHandler(
+        config['LOG_FILE'], maxBytes=config['LOG_MAX_BYTES'], backupCount=config['LOG_BACKUP_COUNT']
+    )
+    file_handler.setFormatter(JsonFormatter())
+    listener = DrainingQueueListener(log_queue, file_handler, respect_handler_level=True)
+    listener.start()
+    atexit.register(listener.stop)
+
+    handler = DroppingQueueHandler(log_queue)
+    app.logger.setLevel(logging.INFO)
+    # Flask's stderr handler would write synchronously from the request.
+    app.logger.removeHandler(default_handler)
+    app.logger.addHandler(handler)
+    app.extensions['request_logging'] = handler
+
+    @app.before_request
+    def start_request_log():
+        g.request_id = request.headers.get('X-Request-ID', '')[:64] or uuid.uuid4().hex
+        g.request_started = time.perf_counter()
+
+    @app.after_request
+    def finish_request_log(response):
+        request_id, started = g.get('request_id'), g.get('request_started')
+        if request_id is None:
+            return response
+        response.headers['X-Request-ID'] = request_id
+        extra = {
+            'request_id': request_id,
+            'method': request.method,
+            'path': request.full_path.rstrip('?'),
+            'status': response.status_code,
+            'remote_addr': request.remote_addr
+        }
+
+        # Streamed responses finish after this hook, so time to close.
+        def log_access():
+            extra['duration_ms'] = round((time.perf_counter() - started) * 1000, 3)
+            app.logger.info('request', extra=extra)
+        response.call_on_close(log_access)
+        return response
+
+    return listener
@@ -0,0 +1,141 @@
+"""
+Ranked name/city/genre search for venues and artists.
+
+PostgreSQL uses a pg_trgm index on name (which also serves substring
+ILIKE matches) plus a GIN index over a tsvector of name, city and genres.
+SQLite, for local development, uses an FTS5 table kept in sync with
+triggers. Any other database falls back to an unranked ILIKE scan.
+
+The indexes are created by the search migration and, for databases built
+with db.create_all(), by the DDL hooks registered in install_search_ddl().
+"""
+import re
+
+from sqlalchemy import DDL, event, text
+
+# Must stay identical to the expression indexed by the search migrations,
+# otherwise PostgreSQL cannot use the index. array_to_string() is not
+# immutable, hence the wrapper function for the genres array.
+TSVECTOR_SQL = (
+    "to_tsvector('simple', coalesce(name, '') || ' ' || "
+    "coalesce(city, '') || ' ' || fyyur_genres_text(genres))"
+)
+GENRES_TEXT_FUNCTION_SQL = (
+    "CREATE OR REPLACE FUNCTION fyyur_genres_text(varchar[]) RETURNS text "
+    "LANGUAGE sql IMMUTABLE AS $$ SELECT coalesce(array_to_string($1, ' '), '') $$"
+)
+
+_WORD = re.compile(r'\w+', re.UNICODE)
+
+
+def _tokens(term):
+    return _WORD.findall(term.lower())
+
+
+def _like_pattern(term):
+    escaped = term.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_')
+    return '%{}%'.format(escaped)
+
+
+def install_search_ddl(table):
+    """Create (and drop) the search indexes along with table."""
+    name = table.name
+    event.listen(table, 'after_create', DDL(
+        'CREATE EXTENSION IF NOT EXISTS pg_trgm'
+    ).execute_if(dialect='postgresql'))
+    event.listen(table, 'after_create', DDL(
+        GENRES_TEXT_FUNCTION_SQL
+    ).execute_if(dialect='postgresql'))
+    event.listen(table, 'after_create', DDL(
+        'CREATE INDEX "ix_{0}_name_trgm" ON "{0}" USING gin (name gin_trgm_ops)'.format(name)
+    ).execute_if(dialect='postgresql'))
+    event.listen(table, 'after_create', DDL(
+        'CREATE INDEX "ix_{0}_search" ON "{0}" USING gin ({1})'.format(name, TSVECTOR_SQL)
+    ).execute_if(dialect='postgresql'))
+
+    for statement in sqlite_fts_ddl(name):
+        event.listen(table, 'after_create', DDL(statement).execute_if(dialect='sqlite'))
+    event.listen(table, 'before_drop', DDL(
+        'DROP TABLE IF EXISTS "{}_fts"'.format(name)
+    ).execute_if(dialect='sqlite'))
+
+
+def sqlite_fts_ddl(name):
+    """Statements creating an external-content FTS5 index for table name."""
+    columns = 'name, city, genres'
+    new_values = 'new.id, new.name, new.city, new.genres'
+    old_values = "'delete', old.id, old.name, old.city, old.genres"
+    return [
+        'CREATE VIRTUAL TABLE IF NOT EXISTS "{0}_fts" USING fts5('
+        '{1}, content=\'{0}\', content_rowid=\'id\')'.format(name, columns),
+        'CREATE TRIGGER IF NOT EXISTS "{0}_fts_insert" AFTER INSERT ON "{0}" BEGIN '
+        'INSERT INTO "{0}_fts"(rowid, {1}) VALUES ({2}); END'.format(name, columns, new_values),
+        'CREATE TRIGGER IF NOT EXISTS "{0}_fts_delete" AFTER DELETE ON "{0}" BEGIN '
+        'INSERT INTO "{0}_fts"("{0}_fts", rowid, {1}) VALUES ({2}); END'.format(name, columns, old_values),
+        'CREATE TRIGGER IF NOT EXISTS "{0}_fts_update" AFTER UPDATE ON "{0}" BEGIN '
+        'INSERT INTO "{0}_fts"("{0}_fts", rowid, {1}) VALUES ({2}); '
+        'INSERT INTO "{0}_fts"(rowid, {1}) VALUES ({3}); END'.format(name, columns, old_values, new_values),
+        'INSERT INTO "{0}_fts"("{0}_fts") VALUES (\'rebuild\')'.format(name),
+    ]
+
+
+def search_table(session, table, term, limit=50):
+    """
+    Search table (Venue or Artist) for term. Archived rows are skipped.
+
+    :return: up to limit {"id", "name"} dicts, best match first
+    """
+    term = (term or '').strip()
+    if not term:
+        return []
+    dialect = session.connection().dialect.name
+    if dialect == 'postgresql':
+        rows = _search_postgresql(session, table.name, term, limit)
+    elif dialect == 'sqlite' and _tokens(term):
+        rows = _search_sqlite(session, table.name, term, limit)
+    else:
+        rows = _search_ilike(session, table.name, term, limit)
+    return [{"id": row.id, "name": row.name} for row in rows]
+
+
+def _search_postgresql(session, name, term, limit):
+    # Substring matches come from the trigram index, whole-word and prefix
+    # matches on name/city/genres from the tsvector index.
+    tokens = _tokens(term)
+    tsquery = ' & '.join(token + ':*' for token in tokens) if tokens else None
+    sql = text(
+        'SELECT id, name FROM "{0}" '
+        'WHERE archived_at IS NULL AND (name ILIKE :pattern '
+        'OR (CAST(:tsquery AS text) IS NOT NULL '
+        '    AND {1} @@ to_tsquery(\'simple\', :tsquery))) '
+        'ORDER BY coalesce(ts_rank({1}, to_tsquery(\'simple\', :tsquery)), 0) '
+        '       + similarity(name, :term) DESC, id '
+        'LIMIT :limit'.format(name, TSVECTOR_SQL)
+    )
+    return session.execute(sql, {
+        'pattern': _like_pattern(term),
+        'tsquery': tsquery,
+        'term': term,
+        'limit': limit,
+    })
+
+
+def _search_sqlite(session, name, term, limit):
+    # Every word must match as a prefix of some word in name, city or genres.
+    match = ' '.join('"{}"*'.format(token) for token in _tokens(term))
+    sql = text(
+        'SELECT t.id, t.name FROM "{0}_fts" f JOIN "{0}" t ON t.id = f.rowid '
+        'WHERE "{0}_fts" MATCH :match AND t.archived_at IS NULL '
+        'ORDER BY bm25("{0}_fts", 10.0, 2.0, 1.0), t.id '
+        'LIMIT :limit'.format(name)
+    )
+    return session.execute(sql, {'match': match, 'limit': limit})
+
+
+def _search_ilike(session, name, term, limit):
+    sql = text(
+        'SELECT id, name FROM "{0}" '
+        "WHERE archived_at IS NULL AND lower(name) LIKE lower(:pattern) ESCAPE '\\' "
+        'ORDER BY id LIMIT :limit'.format(name)
+    )
+    return session.execute(sql, {'pattern': _like_pattern(term), 'limit': limit})
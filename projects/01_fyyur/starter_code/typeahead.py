@@ -0,0 +1,133 @@
+"""
+In-memory prefix index for the venue and artist autocomplete endpoints.
+
+Names are normalised (accents stripped, case folded, whitespace collapsed)
+and every word start is indexed, so "hop" finds "The Musical Hop". Keys
+live in one sorted list and a prefix lookup is a bisect followed by a
+short forward scan.
+
+Writers build a new (keys, names) pair and swap it in with one
+assignment, so lookups never take a lock and always see keys and names
+of the same version. Each process keeps its own index: writes handled
+elsewhere show up after the next periodic refresh.
+"""
+import bisect
+import sys
+import threading
+import time
+import unicodedata
+
+
+def normalize(name):
+    decomposed = unicodedata.normalize('NFKD', name or '')
+    stripped = ''.join(c for c in decomposed if not unicodedata.combining(c))
+    return ' '.join(stripped.casefold().split())
+
+
+class PrefixIndex(object):
+
+    def __init__(self, max_entries=200000, max_key_length=64, refresh_seconds=None):
+        self.max_entries = max_entries
+        self.max_key_length = max_key_length
+        self.refresh_seconds = refresh_seconds
+        self.built_at = None
+        # (sorted (key, id) pairs, id -> display name), replaced as a whole
+        self._entries = ([], {})
+        self._lock = threading.Lock()
+        self._rebuild_lock = threading.Lock()
+
+    def _keys_for(self, item_id, name):
+        words = normalize(name).split(' ')
+        return [
+            (' '.join(words[i:])[:self.max_key_length], item_id)
+            for i in range(len(words)) if words[i]
+        ]
+
+    def stale(self):
+        if self.built_at is None:
+            return True
+        return self.refresh_seconds is not None and \
+            time.monotonic() - self.built_at > self.refresh_seconds
+
+    def refresh(self, load):
+        """
+        Rebuild from load() (rows of (id, name)) if the index is stale. One
+        caller rebuilds at a time; the others keep searching the current
+        index meanwhile, or wait when there is none yet.
+        """
+        if not self.stale():
+            return
+        if not self._rebuild_lock.acquire(blocking=self.built_at is None):
+            return
+        try:
+            if self.stale():
+                self.rebuild(load())
+        finally:
+            self._rebuild_lock.release()
+
+    def rebuild(self, rows):
+        """Replace the whole index with rows of (id, name)."""
+        keys, names = [], {}
+        for item_id, name in rows:
+            item_keys = self._keys_for(item_id, name)
+            if len(keys) + len(item_keys) > self.max_entries:
+                break
+            keys.extend(item_keys)
+            names[item_id] = name
+        keys.sort()
+        with self._lock:
+            self._entries = keys, names
+            self.built_at = time.monotonic()
+
+    def add(self, item_id, name):
+        """Insert or rename one item; returns False if the index is full."""
+        if self.built_at is None:
+            return False
+        with self._lock:
+            old_keys, old_names = self._entries
+            keys = [key for key in old_keys if key[1] != item_id] \
+                if item_id in old_names else list(old_keys)
+            new_keys = self._keys_for(item_id, name)
+            if len(keys) + len(new_keys) > self.max_entries:
+                return False
+            for key in new_keys:
+                bisect.insort(keys, key)
+            names = dict(old_names)
+            names[item_id] = name
+            self._entries = keys, names
+        return True
+
+    def remove(self, item_id):
+        with self._lock:
+            keys, names = self._entries
+            if item_id not in names:
+                return
+            names = dict(names)
+            del names[item_id]
+            self._entries = [key for key in keys if key[1] != item_id], names
+
+    def search(self, prefix, limit=10):
+        """Return up to limit {"id", "name"} dicts whose words start with prefix."""
+        prefix = normalize(prefix)[:self.max_key_length]
+        if not prefix or limit < 1:
+            return []
+        keys, names = self._entries
+        results, seen = [], set()
+        for i in range(bisect.bisect_left(keys, (prefix,)), len(keys)):
+            key, item_id = keys[i]
+            if not key.startswith(prefix):
+                break
+            if item_id not in seen:
+                seen.add(item_id)
+                results.append({"id": item_id, "name": names[item_id]})
+                if len(results) >= limit:
+                    break
+        return results
+
+    def stats(self):
+        keys, names = self._entries
+        return {
+            "entries": len(keys),
+            "items": len(names),
+            "approx_bytes": sys.getsizeof(keys) + sum(sys.getsizeof(key[0]) for key in keys)
+        }
@@ -0,0 +1,52 @@
+"""
+Benchmark GET /questions: the old load-everything-then-slice pagination
+against LIMIT/OFFSET pages, after_id keyset pages and the cached count.
+
+    python benchmarks/bench_pagination.py [--sizes 10000 100000 1000000]
+"""
+import argparse
+
+from common import app, db, Question, measure, report, seed
+
+from flaskr import QPP
+
+# The legacy path builds every question as an ORM object and a dict; past
+# this size it needs gigabytes of memory.
+LEGACY_LIMIT = 100000
+
+
+def legacy_page(page):
+    selection = Question.query.order_by(Question.id).all()
+    questions = [question.format() for question in selection]
+    return questions[(page - 1) * QPP:page * QPP], len(selection)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--sizes', type=int, nargs='+', default=[10000, 100000, 1000000])
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+
+    client = app.test_client()
+    rows = []
+    with app.app_context():
+        for size in args.sizes:
+            seed(size)
+            last_page = (size + QPP - 1) // QPP
+            last_after_id = size - QPP
+            if size <= LEGACY_LIMIT:
+                rows.append(('legacy page 1', size) + measure(lambda: legacy_page(1), 1))
+            rows.append(('COUNT(*)', size) + measure(
+                lambda: db.session.query(db.func.count(Question.id)).scalar(), args.repeat))
+            client.get('/questions')  # fill the count cache
+            rows.append(('GET /questions', size) + measure(
+                lambda: client.get('/questions').data, args.repeat))
+            rows.append(('GET ?page=<last>', size) + measure(
+                lambda: client.get('/questions?page={}'.format(last_page)).data, args.repeat))
+            rows.append(('GET ?after_id=<last page>', size) + measure(
+                lambda: client.get('/questions?after_id={}'.format(last_after_id)).data, args.repeat))
+    report('Question pagination', rows)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,56 @@
+"""
+Benchmark one /quizzes step: the old load-every-remaining-question query
+against the id-array sampler, for a fresh quiz and one 50 questions in.
+
+    python benchmarks/bench_quiz.py [--sizes 10000 100000 1000000]
+"""
+import argparse
+
+from common import app, db, Question, measure, report, seed
+
+from sampler import QuestionSampler
+
+# The legacy path loads every remaining question as an ORM object; past
+# this size it needs gigabytes of memory.
+LEGACY_LIMIT = 100000
+
+
+def legacy_step(category, previous):
+    query = Question.query
+    if category is not None:
+        query = query.filter_by(category=category)
+    return query.filter(Question.id.notin_(previous)).all()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--sizes', type=int, nargs='+', default=[10000, 100000, 1000000])
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+
+    client = app.test_client()
+    rows = []
+    with app.app_context():
+        for size in args.sizes:
+            seed(size)
+            previous = list(range(1, size + 1, max(size // 50, 1)))[:50]
+            sampler = QuestionSampler(db.session, Question)
+            rows.append(('sampler build', size) + measure(sampler.build, 1))
+            for category in (None, '1'):
+                label = 'all' if category is None else 'category'
+                for seen in ([], previous):
+                    case = '{}, {} seen'.format(label, len(seen))
+                    if size <= LEGACY_LIMIT:
+                        rows.append(('legacy ' + case, size) + measure(
+                            lambda: legacy_step(category, seen), 1))
+                    rows.append(('sampler ' + case, size) + measure(
+                        lambda: sampler.pick(category, set(seen)), args.repeat))
+            quiz_round = {'previous_questions': previous, 'quiz_category': {'type': 'Science', 'id': 1}}
+            client.post('/quizzes', json=quiz_round)  # build the app's sampler
+            rows.append(('POST /quizzes', size) + measure(
+                lambda: client.post('/quizzes', json=quiz_round).data, args.repeat))
+    report('Quiz step', rows)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,50 @@
+"""
+Benchmark POST /questions/search engines: the old unranked ilike query
+returning every match against one ranked page from each engine. The
+PostgreSQL full-text engine only runs when DATABASE_URL is PostgreSQL.
+
+    python benchmarks/bench_search.py [--sizes 10000 100000 1000000]
+"""
+import argparse
+
+from common import app, db, Question, measure, report, seed
+
+from flaskr import QPP
+from search import InvertedIndex, LikeSearch, PostgresSearch
+
+TERMS = ['river', 'famous painter', 'zzz']
+
+
+def legacy_search(term):
+    return [question.format() for question in
+            Question.query.filter(Question.question.ilike(f'%{term}%')).all()]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--sizes', type=int, nargs='+', default=[10000, 100000, 1000000])
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+
+    rows = []
+    with app.app_context():
+        for size in args.sizes:
+            seed(size)
+            engines = [('like', LikeSearch(db.session, Question))]
+            index = InvertedIndex(db.session, Question)
+            rows.append(('index build', size) + measure(index.build, 1))
+            engines.append(('index', index))
+            if db.engine.dialect.name == 'postgresql':
+                postgres = PostgresSearch(db.session, Question)
+                rows.append(('postgres index build', size) + measure(postgres.create_index, 1))
+                engines.append(('postgres', postgres))
+            for term in TERMS:
+                rows.append(('legacy "{}"'.format(term), size) + measure(lambda: legacy_search(term), 1))
+                for name, engine in engines:
+                    rows.append(('{} "{}"'.format(name, term), size) + measure(
+                        lambda: engine.search(term, 0, QPP), args.repeat))
+    report('Question search (first page of {})'.format(QPP), rows)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,109 @@
+"""
+Shared helpers for the trivia benchmarks.
+
+Run a benchmark from the backend directory, e.g.
+
+    python benchmarks/bench_pagination.py
+
+By default the benchmarks use a throwaway SQLite file. Set DATABASE_URL to
+a (disposable!) PostgreSQL database to benchmark against the real thing;
+seeding drops and recreates every table.
+"""
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+from contextlib import contextmanager
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir))
+os.environ.setdefault(
+    'DATABASE_URL',
+    'sqlite:///' + os.path.join(tempfile.gettempdir(), 'trivia_bench.db')
+)
+
+from sqlalchemy import event, text
+
+from flaskr import create_app
+from models import db, Question, Category
+
+CATEGORIES = ['Science', 'Art', 'Geography', 'History', 'Entertainment', 'Sports']
+WORDS = [
+    'what', 'which', 'who', 'year', 'city', 'river', 'painter', 'planet',
+    'element', 'team', 'movie', 'author', 'largest', 'first', 'famous',
+    'capital', 'ocean', 'mountain', 'song', 'king', 'queen', 'war', 'bridge',
+    'island', 'language', 'composer', 'actor', 'museum', 'festival', 'desert'
+]
+BATCH_SIZE = 10000
+
+app = create_app()
+
+
+def _batched(table, rows):
+    batch = []
+    for row in rows:
+        batch.append(row)
+        if len(batch) == BATCH_SIZE:
+            db.session.execute(table.insert(), batch)
+            batch = []
+    if batch:
+        db.session.execute(table.insert(), batch)
+
+
+def seed(questions, seed=0):
+    """Drop and recreate the tables with len(CATEGORIES) categories and
+    `questions` generated questions, spread evenly over them."""
+    rng = random.Random(seed)
+    db.drop_all()
+    db.create_all()
+    _batched(Category.__table__, (
+        {'id': i, 'type': name} for i, name in enumerate(CATEGORIES, 1)
+    ))
+    _batched(Question.__table__, ({
+        'id': i,
+        'question': ' '.join(rng.choice(WORDS) for _ in range(rng.randint(5, 10))) + '?',
+        'answer': ' '.join(rng.choice(WORDS) for _ in range(rng.randint(1, 3))),
+        'category': str(rng.randint(1, len(CATEGORIES))),
+        'difficulty': rng.randint(1, 5)
+    } for i in range(1, questions + 1)))
+    if db.engine.dialect.name == 'postgresql':
+        for table in ('categories', 'questions'):
+            db.session.execute(text(
+                "SELECT setval(pg_get_serial_sequence('{0}', 'id'), (SELECT max(id) FROM {0}))".format(table)
+            ))
+    db.session.commit()
+
+
+@contextmanager
+def count_queries():
+    """Count the statements sent to the database inside the block."""
+    counter = {'queries': 0}
+
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        counter['queries'] += 1
+
+    event.listen(db.engine, 'before_cursor_execute', before_cursor_execute)
+    try:
+        yield counter
+    finally:
+        event.remove(db.engine, 'before_cursor_execute', before_cursor_execute)
+
+
+def measure(fn, repeat=5):
+    """Run fn repeat times; return (median ms, queries per run)."""
+    timings = []
+    with count_queries() as counter:
+        for _ in range(repeat):
+            start = time.perf_counter()
+            fn()
+            timings.append((time.perf_counter() - start) * 1000)
+            db.session.remove()
+    return statistics.median(timings), counter['queries'] // repeat
+
+
+def report(title, rows):
+    print(title)
+    print('  {:<32} {:>10} {:>12} {:>9}'.format('case', 'rows', 'median ms', 'queries'))
+    for name, size, ms, queries in rows:
+        print('  {:<32} {:>10} {:>12.2f} {:>9}'.format(name, size, ms, queries))
@@ -1,14 +1,37 @@
 import os
+import click
 from flask import Flask, request, abort, jsonify
 from flask_sqlalchemy import SQLAlchemy
 from flask_cors import CORS
-import random
 
-from models import setup_db, Question, Category
+from models import setup_db, db, Question, Category, CachedCount, CategoryCache, on_committed_rows
+from sampler import ALL, QuestionSampler
+from quiz_sessions import QuizStore
+from search import InvertedIndex, PostgresSearch, create_search
 
 
 # questions per page, used for pagination
 QPP = 10
+# seconds a cached question count is trusted without a local write, so
+# writes made by other server processes show up
+COUNT_MAX_AGE = 60
+# same for the cached categories, which hardly ever change
+CATEGORY_MAX_AGE = 300
+# seconds before the quiz sampler reloads its question ids
+SAMPLER_MAX_AGE = 300
+# quiz sessions: seconds a session lives after its last step, most sessions
+# kept in memory, and a SQLite file to keep them in instead (shared by the
+# server processes of one host)
+QUIZ_SESSION_TTL = 3600
+QUIZ_MAX_SESSIONS = 10000
+QUIZ_SESSION_DB = os.environ.get('QUIZ_SESSION_DB')
+# question search: 'postgres' (full-text, GIN index), 'index' (in-process
+# inverted index) or 'like' (substring scan); by default 'postgres' on
+# PostgreSQL and 'index' elsewhere
+SEARCH_ENGINE = os.environ.get('SEARCH_ENGINE')
+# seconds before the in-process index is rebuilt to pick up writes made by
+# other processes; None keeps it for the life of the process
+SEARCH_INDEX_MAX_AGE = None
 
 
 def create_app():
@@ -19,6 +42,21 @@ def create_app():
     app = Flask(__name__)
     setup_db(app)
     CORS(app)
+    question_count = CachedCount(Question, max_age=COUNT_MAX_AGE)
+    category_cache = CategoryCache(max_age=CATEGORY_MAX_AGE)
+    sampler = QuestionSampler(db.session, Question, max_age=SAMPLER_MAX_AGE)
+    on_committed_rows(app, Question.__tablename__, sampler.row_changed)
+    quiz_store = QuizStore(QUIZ_MAX_SESSIONS, QUIZ_SESSION_TTL, QUIZ_SESSION_DB)
+    question_search = create_search(
+        db.session, Question, db.engine.dialect.name, SEARCH_ENGINE, SEARCH_INDEX_MAX_AGE
+    )
+    if isinstance(question_search, InvertedIndex):
+        on_committed_rows(app, Question.__tablename__, question_search.row_changed)
+    if isinstance(question_search, PostgresSearch) and not question_search.index_exists():
+        app.logger.warning(
+            'The search index is missing; searches scan the questions table '
+            'until it is built with "flask create-search-index".'
+        )
 
     @app.after_request
     def after_request(response):
@@ -40,27 +78,35 @@ def create_app():
 
         :return: available categories
         """
-        categories = Category.query.order_by(Category.type).all()
+        categories = category_cache.get()
 
         if not categories:
             abort(404)
 
         return jsonify({
             'success': True,
-            'categories': {
-                category.id: category.type for category in categories
-            }
+            'categories': categories
         })
 
     def paginate_questions(request, selection):
-        page = request.args.get('page', 1, type=int)
-        start = (page - 1) * QPP
-        end = start + QPP
-
-        questions = [question.format() for question in selection]
-        current_questions = questions[start:end]
+        """
+        Fetch one page of the selection, QPP questions in id order.
 
-        return current_questions
+        Pages are numbered (?page=n, LIMIT/OFFSET) or, cheaper for deep
+        pages, follow a keyset cursor (?after_id=<last id seen>).
+        :return: formatted questions of the page
+        """
+        selection = selection.order_by(Question.id)
+        after_id = request.args.get('after_id', type=int)
+        if after_id is not None:
+            selection = selection.filter(Question.id > after_id)
+        else:
+            page = request.args.get('page', 1, type=int)
+            if page < 1:
+                abort(404)
+            selection = selection.offset((page - 1) * QPP)
+
+        return [question.format() for question in selection.limit(QPP)]
 
     @app.route('/questions')
     def retrieve_questions():
@@ -75,10 +121,7 @@ def create_app():
         ten questions per page and pagination at the bottom of the screen for three pages.
         Clicking on the page numbers should update the questions.
         """
-        selection = Question.query.order_by(Question.id).all()
-        current_questions = paginate_questions(request, selection)
-
-        categories = Category.query.order_by(Category.type).all()
+        current_questions = paginate_questions(request, Question.query)
 
         if not current_questions:
             abort(404)
@@ -86,9 +129,10 @@ def create_app():
         return jsonify({
             'success': True,
             'questions': current_questions,
-            'total_questions': len(selection),
-            'categories': {category.id: category.type for category in categories},
-            'current_category': None
+            'total_questions': question_count.get(),
+            'categories': category_cache.get(),
+            'current_category': None,
+            'next_after_id': current_questions[-1]['id'] if len(current_questions) == QPP else None
         })
 
     @app.route("/questions/<question_id>", methods=['DELETE'])
@@ -151,8 +195,9 @@ def create_app():
     def search_questions():
         """
         Create a POST endpoint to get questions based on a search term.
-        It should return any questions for whom the search term
-        is a substring of the question.
+        It should return any questions whose question or answer text
+        contains every word of the search term, best matches first,
+        QPP per page.
 
         TEST: Search by any phrase. The questions list will update to include
         only question that include that string within their question.
@@ -161,15 +206,17 @@ def create_app():
         """
         body = request.get_json()
         search_term = body.get('searchTerm', None)
+        page = body.get('page', 1)
 
         if search_term:
-            search_results = Question.query.filter(
-                Question.question.ilike(f'%{search_term}%')).all()
+            if not isinstance(page, int) or page < 1:
+                abort(422)
+            search_results, total = question_search.search(search_term, (page - 1) * QPP, QPP)
 
             return jsonify({
                 'success': True,
                 'questions': [question.format() for question in search_results],
-                'total_questions': len(search_results),
+                'total_questions': total,
                 'current_category': None
             })
         abort(404)
@@ -219,27 +266,92 @@ def create_app():
                 abort(422)
 
             category = body.get('quiz_category')
-            previous_questions = body.get('previous_questions')
+            previous_questions = set(body.get('previous_questions'))
 
-            if category['type'] == 'click':
-                available_questions = Question.query.filter(
-                    Question.id.notin_((previous_questions))
-                ).all()
-            else:
-                category_questions = Question.query.filter_by(category=category['id'])
-                available_questions = category_questions.filter(Question.id.notin_(previous_questions)).all()
-
-            new_question = None
-            if len(available_questions) > 0:
-                new_question = available_questions[random.randrange(0, len(available_questions))].format()
+            category_id = ALL if category['type'] == 'click' else category['id']
+            new_question = sampler.pick(category_id, previous_questions)
 
             return jsonify({
                 'success': True,
-                'question': new_question
+                'question': new_question.format() if new_question else None
             })
         except:
             abort(422)
 
+    @app.route('/status/cache')
+    def cache_status():
+        """
+        Hit and miss counters of the in-process caches.
+
+        :return: stats per cache
+        """
+        return jsonify({
+            'success': True,
+            'categories': category_cache.stats(),
+            'total_questions': question_count.stats()
+        })
+
+    @app.route('/quizzes/sessions', methods=['POST'])
+    def start_quiz():
+        """
+        Start a quiz in the given category ("click" type for all categories).
+        The server remembers which questions the quiz has asked, so each
+        step only sends the returned token.
+
+        :return: token of the quiz session
+        """
+        body = request.get_json(silent=True) or {}
+        category = body.get('quiz_category')
+        if not isinstance(category, dict) or 'type' not in category:
+            abort(422)
+
+        quiz = quiz_store.create(ALL if category['type'] == 'click' else category.get('id'))
+
+        return jsonify({
+            'success': True,
+            'token': quiz.token,
+            'expires_in': QUIZ_SESSION_TTL
+        })
+
+    @app.route('/quizzes/sessions/<token>', methods=['POST'])
+    def next_quiz_question(token):
+        """
+        Get the next random question of a quiz session, one it has not
+        asked before.
+
+        :param token: quiz session token
+        :return: the question, or None when the category is exhausted
+        """
+        quiz = quiz_store.get(token)
+        if quiz is None:
+            abort(404)
+
+        question = sampler.pick(quiz.category, quiz.seen)
+        if question is not None:
+            quiz.seen.add(question.id)
+        quiz_store.save(quiz)
+
+        return jsonify({
+            'success': True,
+            'question': question.format() if question else None
+        })
+
+    @app.route('/quizzes/sessions/<token>', methods=['DELETE'])
+    def end_quiz(token):
+        """
+        End a quiz session.
+
+        :param token: quiz session token
+        :return: ended token
+        """
+        if not quiz_store.end(token):
+            abort(404)
+
+        return jsonify({
+            'success': True,
+            'ended': token
+        })
+
     # error handling
     @app.errorhandler(404)
     def not_found(error):
@@ -280,4 +392,18 @@ def create_app():
             "message": "Error! Bad Request"
         }), 400
 
+    @app.cli.command('create-search-index')
+    def create_search_index():
+        """
+        Build the full-text search index on PostgreSQL without blocking
+        writes (CREATE INDEX CONCURRENTLY). Run it once, before or after
+        deploying; it does nothing when the index is already in place.
+        """
+        if db.engine.dialect.name != 'postgresql':
+            raise click.ClickException('The search index is only used on PostgreSQL.')
+        if PostgresSearch(db.session, Question).create_index():
+            click.echo('Search index built.')
+        else:
+            click.echo('Search index already in place.')
+
     return app
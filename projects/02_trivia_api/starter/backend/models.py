@@ -1,10 +1,15 @@
 import os
-from sqlalchemy import Column, String, Integer, create_engine
+import threading
+import time
+from collections import defaultdict
+from sqlalchemy import Column, String, Integer, create_engine, event, func, inspect
 from flask_sqlalchemy import SQLAlchemy
 import json
 
 database_name = "trivia"
-database_path = "postgres://{}/{}".format('localhost:5432', database_name)
+database_path = os.environ.get(
+  'DATABASE_URL', "postgres://{}/{}".format('localhost:5432', database_name)
+)
 
 db = SQLAlchemy()
 
@@ -75,4 +80,159 @@ class Category(db.Model):
     return {
       'id': self.id,
       'type': self.type
-    }
\ No newline at end of file
+    }
+
+
+'''
+Table revisions
+    table name -> number of commits (in this process) that inserted, updated
+    or deleted rows of that table; caches keep the revision they were built
+    at and rebuild when it moves
+
+Row listeners
+    per app (in app.extensions), table name -> callables told, once the
+    commit has gone through, about each row the app's sessions inserted
+    ('insert') or updated ('update'), as the row's format(), or deleted
+    ('delete'), as {'id': id}; bulk statements are reported as
+    ('bulk', None). Kept with the app so they go away with it.
+'''
+revisions = defaultdict(int)
+revisions_lock = threading.Lock()
+
+
+def on_committed_rows(app, table, listener):
+  app.extensions.setdefault('row_listeners', defaultdict(list))[table].append(listener)
+
+
+def _row_listeners(session, table):
+  # Flask-SQLAlchemy sessions know the app they were opened for.
+  app = getattr(session, 'app', None)
+  return app.extensions.get('row_listeners', {}).get(table, ()) if app is not None else ()
+
+
+def _changed_tables(session):
+  return session.info.setdefault('changed_tables', set())
+
+
+def _changed_rows(session):
+  return session.info.setdefault('changed_rows', [])
+
+
+@event.listens_for(db.session, 'after_flush')
+def note_flushed_tables(session, flush_context):
+  # new/dirty/deleted still hold the flushed objects at this point, and
+  # new objects already have their ids
+  for op, objs in (('insert', session.new), ('update', session.dirty), ('delete', session.deleted)):
+    for obj in objs:
+      table = getattr(obj, '__tablename__', None)
+      if table is None:
+        continue
+      _changed_tables(session).add(table)
+      if _row_listeners(session, table):
+        row = {'id': inspect(obj).identity[0]} if op == 'delete' else obj.format()
+        _changed_rows(session).append((table, op, row))
+
+
+@event.listens_for(db.session, 'after_bulk_update')
+@event.listens_for(db.session, 'after_bulk_delete')
+def note_bulk_tables(context):
+  table = context.mapper.local_table.name
+  _changed_tables(context.session).add(table)
+  if _row_listeners(context.session, table):
+    _changed_rows(context.session).append((table, 'bulk', None))
+
+
+@event.listens_for(db.session, 'after_commit')
+def bump_revisions(session):
+  tables = session.info.pop('changed_tables', ())
+  with revisions_lock:
+    for table in tables:
+      revisions[table] += 1
+  for table, op, row in session.info.pop('changed_rows', ()):
+    for listener in _row_listeners(session, table):
+      listener(op, row)
+
+
+@event.listens_for(db.session, 'after_rollback')
+def forget_changed_tables(session):
+  session.info.pop('changed_tables', None)
+  session.info.pop('changed_rows', None)
+
+
+'''
+RevisionCache
+    a value built from a table, rebuilt only after a commit changed the
+    table, or after max_age seconds so writes made by other processes show
+    up eventually; counts hits and misses
+'''
+class RevisionCache(object):
+
+  def __init__(self, table, build, max_age=None):
+    self.table = table
+    self.build = build
+    self.max_age = max_age
+    self.hits = 0
+    self.misses = 0
+    self._value = None
+    self._revision = None
+    self._built_at = 0
+    self._lock = threading.Lock()
+
+  def get(self):
+    revision = revisions[self.table]
+    with self._lock:
+      expired = self.max_age is not None and time.monotonic() - self._built_at > self.max_age
+      fresh = self._revision == revision and not expired
+      if fresh:
+        self.hits += 1
+        return self._value
+      self.misses += 1
+    # a commit landing while we build moves the revision past the one
+    # stored here, so the next call builds again
+    value = self.build()
+    with self._lock:
+      self._value, self._revision, self._built_at = value, revision, time.monotonic()
+    return value
+
+  def stats(self):
+    with self._lock:
+      lookups = self.hits + self.misses
+      return {
+        'table': self.table,
+        'revision': self._revision,
+        'hits': self.hits,
+        'misses': self.misses,
+        'hit_rate': round(self.hits / lookups, 4) if lookups else None
+      }
+
+
+'''
+CachedCount
+    COUNT(*) of a model's table, kept until the table changes
+'''
+class CachedCount(RevisionCache):
+
+  def __init__(self, model, max_age=None):
+    super(CachedCount, self).__init__(
+      model.__tablename__,
+      lambda: db.session.query(func.count(model.id)).scalar(),
+      max_age
+    )
+
+
+'''
+CategoryCache
+    the {id: type} mapping of every category, ordered by type, kept until
+    the categories table changes
+'''
+class CategoryCache(RevisionCache):
+
+  def __init__(self, max_age=None):
+    super(CategoryCache, self).__init__(
+      Category.__tablename__,
+      lambda: {
+        category_id: category_type for category_id, category_type in
+        db.session.query(Category.id, Category.type).order_by(Category.type)
+      },
+      max_age
+    )
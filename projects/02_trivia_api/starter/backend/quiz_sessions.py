@@ -0,0 +1,185 @@
+"""
+Server-side quiz sessions.
+
+A session remembers its quiz category and the questions already asked, so
+every step of a quiz is a constant-size request: the client sends only the
+session token, however long the quiz has run.
+
+Asked question ids are kept in a sparse bitset, one 64-bit word per block
+of 64 ids that holds an asked question, so membership is O(1) and a
+session costs a few words whatever the size of the question bank.
+
+Sessions are held in a bounded in-memory LRU and expire ttl seconds after
+their last step. Given a path, they are kept in a SQLite file instead, so
+they outlive restarts and are shared by the server processes of one host;
+each step is then one primary-key read and one write, and the file is held
+to the same bound (tracked in a one-row count kept by triggers, so checking
+it is O(1)) and swept of expired sessions the same way.
+"""
+import secrets
+import sqlite3
+import threading
+import time
+from array import array
+from collections import OrderedDict
+
+
+SCHEMA_SQL = '''
+BEGIN IMMEDIATE;
+CREATE TABLE IF NOT EXISTS quiz_sessions (
+    token TEXT PRIMARY KEY, category TEXT, seen BLOB NOT NULL, expires_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS ix_quiz_sessions_expires_at ON quiz_sessions (expires_at);
+CREATE TABLE IF NOT EXISTS quiz_session_count (id INTEGER PRIMARY KEY CHECK (id = 1), n INTEGER NOT NULL);
+INSERT OR IGNORE INTO quiz_session_count SELECT 1, count(*) FROM quiz_sessions;
+CREATE TRIGGER IF NOT EXISTS quiz_sessions_inserted AFTER INSERT ON quiz_sessions
+BEGIN UPDATE quiz_session_count SET n = n + 1; END;
+CREATE TRIGGER IF NOT EXISTS quiz_sessions_deleted AFTER DELETE ON quiz_sessions
+BEGIN UPDATE quiz_session_count SET n = n - 1; END;
+COMMIT;
+'''
+
+
+class Bitset(object):
+    __slots__ = ('words',)
+
+    def __init__(self, words=None):
+        self.words = words or {}
+
+    def add(self, n):
+        self.words[n >> 6] = self.words.get(n >> 6, 0) | (1 << (n & 63))
+
+    def __contains__(self, n):
+        return self.words.get(n >> 6, 0) >> (n & 63) & 1 == 1
+
+    def __len__(self):
+        return sum(bin(word).count('1') for word in self.words.values())
+
+    def to_bytes(self):
+        # (block, word) pairs as unsigned 64-bit integers
+        pairs = array('Q')
+        for block, word in self.words.items():
+            pairs.extend((block, word))
+        return pairs.tobytes()
+
+    @classmethod
+    def from_bytes(cls, data):
+        pairs = array('Q')
+        pairs.frombytes(data)
+        return cls(dict(zip(pairs[::2], pairs[1::2])))
+
+
+class QuizSession(object):
+    __slots__ = ('token', 'category', 'seen', 'expires_at')
+
+    def __init__(self, token, category, seen, expires_at):
+        self.token = token
+        self.category = category
+        self.seen = seen
+        self.expires_at = expires_at
+
+
+class QuizStore(object):
+
+    def __init__(self, max_sessions=10000, ttl=3600, path=None):
+        self.max_sessions = max_sessions
+        self.ttl = ttl
+        self._sessions = OrderedDict()
+        self._lock = threading.Lock()
+        self._swept_at = time.time()
+        self._db = None
+        if path is not None:
+            self._db = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+            self._db.executescript(SCHEMA_SQL)
+
+    def create(self, category):
+        """
+        Start a quiz of category (None for every category).
+
+        :return: the new session
+        """
+        quiz = QuizSession(
+            secrets.token_urlsafe(16),
+            None if category is None else str(category),
+            Bitset(),
+            time.time() + self.ttl
+        )
+        self.save(quiz)
+        if self._db is not None:
+            # Only new sessions grow the table. Every step pushes expires_at
+            # on, so the earliest to expire are the least recently used;
+            # under the cap the LIMIT is 0 and nothing is read.
+            with self._lock:
+                self._db.execute(
+                    'DELETE FROM quiz_sessions WHERE token IN ('
+                    'SELECT token FROM quiz_sessions ORDER BY expires_at '
+                    'LIMIT max(0, (SELECT n FROM quiz_session_count) - ?))',
+                    (self.max_sessions,)
+                )
+        return quiz
+
+    def get(self, token):
+        """
+        :return: the live session with this token, or None
+        """
+        if self._db is not None:
+            quiz = self._load(token)
+        else:
+            with self._lock:
+                quiz = self._sessions.get(token)
+                if quiz is not None:
+                    self._sessions.move_to_end(token)
+        if quiz is None or quiz.expires_at < time.time():
+            return None
+        return quiz
+
+    def save(self, quiz):
+        """Store the session after a step, extending its life."""
+        quiz.expires_at = time.time() + self.ttl
+        with self._lock:
+            if self._db is not None:
+                # an upsert, not INSERT OR REPLACE, so the count triggers
+                # see only new sessions
+                self._db.execute(
+                    'INSERT INTO quiz_sessions VALUES (?, ?, ?, ?) ON CONFLICT (token) DO UPDATE SET '
+                    'category = excluded.category, seen = excluded.seen, expires_at = excluded.expires_at',
+                    (quiz.token, quiz.category, quiz.seen.to_bytes(), quiz.expires_at)
+                )
+            else:
+                self._sessions[quiz.token] = quiz
+                self._sessions.move_to_end(quiz.token)
+                while len(self._sessions) > self.max_sessions:
+                    self._sessions.popitem(last=False)
+        if time.time() - self._swept_at > self.ttl / 10:
+            self.sweep()
+
+    def end(self, token):
+        """
+        Forget a session.
+
+        :return: whether it existed
+        """
+        with self._lock:
+            if self._db is not None:
+                return self._db.execute('DELETE FROM quiz_sessions WHERE token = ?', (token,)).rowcount > 0
+            return self._sessions.pop(token, None) is not None
+
+    def sweep(self):
+        """Drop expired sessions."""
+        now = time.time()
+        with self._lock:
+            self._swept_at = now
+            if self._db is not None:
+                self._db.execute('DELETE FROM quiz_sessions WHERE expires_at < ?', (now,))
+            for token in [token for token, quiz in self._sessions.items() if quiz.expires_at < now]:
+                del self._sessions[token]
+
+    def _load(self, token):
+        with self._lock:
+            row = self._db.execute(
+                'SELECT category, seen, expires_at FROM quiz_sessions WHERE token = ?', (token,)
+            ).fetchone()
+        if row is None:
+            return None
+        category, seen, expires_at = row
+        return QuizSession(token, category, Bitset.from_bytes(seen), expires_at)
@@ -0,0 +1,114 @@
+"""
+Random quiz questions without scanning the questions table.
+
+QuestionSampler keeps the ids of all questions, and of every category, in
+compact arrays (8 bytes per id). Drawing a question the player has not
+seen picks random positions until one is neither seen nor deleted: O(1)
+expected tries while less than half of the candidates are excluded. Past
+max_tries the remaining candidates are listed once and one is chosen from
+them. Only the chosen row is then loaded.
+
+The arrays are built with one (id, category) query, kept up to date with
+the questions this process inserts and deletes, and rebuilt after max_age
+seconds so writes made by other processes show up. Deleted ids are
+remembered in a set until they make up a quarter of the arrays, which are
+then rebuilt without them.
+"""
+import random
+import threading
+import time
+from array import array
+
+# key of the array holding every question id
+ALL = None
+
+
+class QuestionSampler(object):
+
+    def __init__(self, session, model, max_age=None, max_tries=16, rng=None):
+        self.session = session
+        self.model = model
+        self.max_age = max_age
+        self.max_tries = max_tries
+        self.rng = rng or random.Random()
+        self._ids = None
+        self._deleted = set()
+        self._built_at = 0
+        self._lock = threading.Lock()
+
+    def build(self):
+        ids = {ALL: array('q')}
+        rows = self.session.query(self.model.id, self.model.category).order_by(self.model.id)
+        for question_id, category in rows.yield_per(10000):
+            ids[ALL].append(question_id)
+            ids.setdefault(str(category), array('q')).append(question_id)
+        with self._lock:
+            self._ids, self._deleted, self._built_at = ids, set(), time.monotonic()
+        return ids
+
+    def index(self):
+        with self._lock:
+            ids, deleted = self._ids, self._deleted
+            expired = self.max_age is not None and time.monotonic() - self._built_at > self.max_age
+        if ids is None or expired:
+            ids, deleted = self.build(), set()
+        return ids, deleted
+
+    def invalidate(self):
+        with self._lock:
+            self._ids = None
+
+    def row_changed(self, op, row):
+        """Keep the arrays in step with committed rows; see models.on_committed_rows."""
+        with self._lock:
+            if self._ids is None:
+                return
+            if op == 'insert':
+                self._ids[ALL].append(row['id'])
+                self._ids.setdefault(str(row['category']), array('q')).append(row['id'])
+            elif op == 'delete':
+                self._deleted.add(row['id'])
+                if len(self._deleted) * 4 > len(self._ids[ALL]):
+                    self._ids = None
+            else:
+                # a question may have changed category
+                self._ids = None
+
+    def draw(self, category=ALL, exclude=()):
+        """
+        Pick a random question id of category (any when ALL) that is not in
+        exclude.
+
+        :param exclude: set of ids not to return
+        :return: question id, or None when every candidate is excluded
+        """
+        ids, deleted = self.index()
+        candidates = ids.get(category if category is ALL else str(category))
+        if not candidates:
+            return None
+        for _ in range(self.max_tries):
+            question_id = candidates[self.rng.randrange(len(candidates))]
+            if question_id not in exclude and question_id not in deleted:
+                return question_id
+        remaining = [
+            question_id for question_id in candidates
+            if question_id not in exclude and question_id not in deleted
+        ]
+        return self.rng.choice(remaining) if remaining else None
+
+    def pick(self, category=ALL, exclude=()):
+        """
+        Load a random question of category that is not in exclude.
+
+        :return: the question, or None when there is none left
+        """
+        for _ in range(3):
+            question_id = self.draw(category, exclude)
+            if question_id is None:
+                return None
+            question = self.session.query(self.model).get(question_id)
+            if question is not None:
+                return question
+            # deleted by another process: start again from fresh arrays
+            self.invalidate()
+        return None
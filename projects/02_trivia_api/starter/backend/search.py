@@ -0,0 +1,241 @@
+"""
+Ranked question search.
+
+Every engine answers search(term, offset, limit) with one page of matching
+questions, best first, and the total number of matches. A question matches
+when all words of the term appear in its question or answer text; words in
+the question count double.
+
+PostgresSearch matches a weighted tsvector of the two columns through an
+expression GIN index and ranks with ts_rank_cd, in one query per page. The
+index is built once, outside of the app, with create_index (the
+create-search-index command), which does not block writes.
+
+InvertedIndex, for SQLite and development, keeps postings (question
+numbers and weighted term counts) per word in compact arrays built with
+one pass over the table and kept up to date with this process's inserts
+and deletes. Matches are the intersection of the words' postings, ranked
+by BM25; only the page's rows are then loaded.
+
+LikeSearch is the plain case-insensitive substring match, in id order.
+"""
+import bisect
+import heapq
+import math
+import re
+import threading
+import time
+from array import array
+
+from sqlalchemy import func, literal_column, text
+
+WORD = re.compile(r'\w+', re.UNICODE)
+
+
+def words(value):
+    return WORD.findall(value.lower()) if value else []
+
+
+class LikeSearch(object):
+
+    def __init__(self, session, model, column='question'):
+        self.session = session
+        self.model = model
+        self.column = getattr(model, column)
+
+    def search(self, term, offset=0, limit=10):
+        query = self.session.query(self.model).filter(self.column.ilike('%{}%'.format(term)))
+        total = query.count()
+        return query.order_by(self.model.id).offset(offset).limit(limit).all(), total
+
+
+class PostgresSearch(object):
+
+    def __init__(self, session, model, weights=(('question', 'A'), ('answer', 'B')), config='english'):
+        self.session = session
+        self.model = model
+        self.config = config
+        # Spelled exactly as in the index, so the planner can use it.
+        self.vector_sql = '(' + ' || '.join(
+            "setweight(to_tsvector('{}', coalesce({}, '')), '{}')".format(config, column, weight)
+            for column, weight in weights
+        ) + ')'
+
+    @property
+    def index_name(self):
+        return 'ix_{}_search'.format(self.model.__tablename__)
+
+    def _index_valid(self, connection):
+        # None when missing; False for the invalid index an interrupted
+        # concurrent build leaves behind.
+        return connection.execute(
+            text('SELECT indisvalid FROM pg_index WHERE indexrelid = to_regclass(:name)'),
+            {'name': '"{}"'.format(self.index_name)}
+        ).scalar()
+
+    def index_exists(self):
+        """Whether the GIN index searches need is in place and usable."""
+        with self.session.get_bind().connect() as connection:
+            return bool(self._index_valid(connection))
+
+    def create_index(self):
+        """
+        Build the GIN index searches need, if it is not in place yet, with
+        CREATE INDEX CONCURRENTLY so writes to the table go on meanwhile.
+        That cannot run in a transaction, so it uses its own autocommit
+        connection. An invalid index left by an interrupted build is
+        dropped and built again.
+
+        :return: whether the index was built
+        """
+        with self.session.get_bind().connect() as connection:
+            connection = connection.execution_options(isolation_level='AUTOCOMMIT')
+            valid = self._index_valid(connection)
+            if valid:
+                return False
+            if valid is not None:
+                connection.execute(text('DROP INDEX CONCURRENTLY IF EXISTS "{}"'.format(self.index_name)))
+            connection.execute(text('CREATE INDEX CONCURRENTLY "{}" ON "{}" USING gin ({})'.format(
+                self.index_name, self.model.__tablename__, self.vector_sql
+            )))
+            return True
+
+    def search(self, term, offset=0, limit=10):
+        vector = literal_column(self.vector_sql)
+        query = func.plainto_tsquery(literal_column("'{}'".format(self.config)), term)
+        matches = self.session.query(self.model).filter(vector.op('@@')(query))
+        rows = matches.add_columns(func.count().over()).order_by(
+            func.ts_rank_cd(vector, query).desc(), self.model.id
+        ).offset(offset).limit(limit).all()
+        if rows:
+            return [question for question, total in rows], rows[0][1]
+        return [], matches.count() if offset else 0
+
+
+class InvertedIndex(object):
+    """
+    :param fields: (column, weight) pairs; a word's count in a question is
+        the sum over the columns of its occurrences times the weight
+    :param max_age: seconds before the index is rebuilt, to pick up writes
+        made by other processes (None: never)
+    """
+    k1 = 1.2
+    b = 0.75
+
+    def __init__(self, session, model, fields=(('question', 2), ('answer', 1)), max_age=None):
+        self.session = session
+        self.model = model
+        self.fields = fields
+        self.max_age = max_age
+        self._index = None
+        self._built_at = 0
+        self._lock = threading.Lock()
+
+    def _add(self, index, question_id, values):
+        counts = {}
+        for value, (column, weight) in zip(values, self.fields):
+            for word in words(value):
+                counts[word] = counts.get(word, 0) + weight
+        number = len(index['ids'])
+        index['ids'].append(question_id)
+        length = min(sum(counts.values()), 65535)
+        index['lengths'].append(length)
+        index['total_length'] += length
+        for word, count in counts.items():
+            postings = index['postings'].get(word)
+            if postings is None:
+                postings = index['postings'][word] = (array('I'), array('H'))
+            postings[0].append(number)
+            postings[1].append(min(count, 65535))
+
+    def build(self):
+        index = {'ids': array('q'), 'lengths': array('H'), 'total_length': 0, 'postings': {}, 'deleted': set()}
+        columns = [getattr(self.model, column) for column, weight in self.fields]
+        rows = self.session.query(self.model.id, *columns).order_by(self.model.id)
+        for row in rows.yield_per(10000):
+            self._add(index, row[0], row[1:])
+        with self._lock:
+            self._index, self._built_at = index, time.monotonic()
+        return index
+
+    def current(self):
+        with self._lock:
+            index = self._index
+            expired = self.max_age is not None and time.monotonic() - self._built_at > self.max_age
+        return self.build() if index is None or expired else index
+
+    def row_changed(self, op, row):
+        """Keep the index in step with committed rows; see models.on_committed_rows."""
+        with self._lock:
+            index = self._index
+            if index is None:
+                return
+            ids = index['ids']
+            if op == 'insert' and (not ids or row['id'] > ids[-1]):
+                self._add(index, row['id'], [row[column] for column, weight in self.fields])
+            elif op == 'delete':
+                number = bisect.bisect_left(ids, row['id'])
+                if number < len(ids) and ids[number] == row['id']:
+                    index['deleted'].add(number)
+                if len(index['deleted']) * 4 > len(ids):
+                    self._index = None
+            else:
+                self._index = None
+
+    def search(self, term, offset=0, limit=10):
+        index = self.current()
+        terms = list(dict.fromkeys(words(term)))
+        postings = [index['postings'].get(word) for word in terms]
+        if not terms or not all(postings):
+            return [], 0
+        count = len(index['ids'])
+        lengths = index['lengths']
+        deleted = index['deleted']
+        # BM25: idf * tf * (k1 + 1) / (tf + k1 * (1 - b + b * length / average length))
+        fixed = self.k1 * (1 - self.b)
+        per_length = self.k1 * self.b * count / index['total_length']
+
+        def idf(numbers):
+            return math.log(1 + (count - len(numbers) + 0.5) / (len(numbers) + 0.5)) * (self.k1 + 1)
+
+        # Score every question holding the rarest word, then look the
+        # others up in their (sorted) postings.
+        order = sorted(postings, key=lambda pair: len(pair[0]))
+        numbers, frequencies = order[0]
+        weight = idf(numbers)
+        scores = {
+            number: weight * frequency / (frequency + fixed + per_length * lengths[number])
+            for number, frequency in zip(numbers, frequencies) if number not in deleted
+        }
+        for numbers, frequencies in order[1:]:
+            weight = idf(numbers)
+            matched = {}
+            for number, score in scores.items():
+                position = bisect.bisect_left(numbers, number)
+                if position < len(numbers) and numbers[position] == number:
+                    frequency = frequencies[position]
+                    matched[number] = score + weight * frequency / (
+                        frequency + fixed + per_length * lengths[number]
+                    )
+            scores = matched
+
+        ranked = heapq.nsmallest(offset + limit, scores.items(), key=lambda item: (-item[1], item[0]))
+        ids = [index['ids'][number] for number, score in ranked[offset:]]
+        rows = {question.id: question for question in
+                self.session.query(self.model).filter(self.model.id.in_(ids))} if ids else {}
+        return [rows[question_id] for question_id in ids if question_id in rows], len(scores)
+
+
+def create_search(session, model, dialect, engine=None, max_age=None):
+    """
+    The search engine to use: engine ('postgres', 'index' or 'like') if
+    given, else PostgresSearch on PostgreSQL and InvertedIndex elsewhere.
+    """
+    engine = engine or ('postgres' if dialect == 'postgresql' else 'index')
+    if engine == 'postgres':
+        return PostgresSearch(session, model)
+    if engine == 'index':
+        return InvertedIndex(session, model, max_age=max_age)
+    if engine == 'like':
+        return LikeSearch(session, model)
+    raise ValueError('unknown search engine {!r}'.format(engine))
@@ -1,10 +1,15 @@
 import os
+import sqlite3
+import tempfile
+import time
 import unittest
 import json
 from flask_sqlalchemy import SQLAlchemy
 
 from flaskr import create_app
-from models import setup_db, Question, Category
+from models import setup_db, Question, Category, db, on_committed_rows, revisions
+from quiz_sessions import QuizStore
+from search import InvertedIndex
 
 
 class TriviaTestCase(unittest.TestCase):
@@ -53,6 +58,60 @@ class TriviaTestCase(unittest.TestCase):
         self.assertEqual(data['success'], False)
         self.assertEqual(data['message'], "Error! Route not found.")
 
+    def test_success_pagination_after_id(self):
+        first_page = json.loads(self.client().get('/questions').data)
+        response = self.client().get('/questions?after_id={}'.format(first_page['next_after_id']))
+        data = json.loads(response.data)
+        second_page = json.loads(self.client().get('/questions?page=2').data)
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(data['success'], True)
+        self.assertEqual(data['questions'], second_page['questions'])
+        self.assertEqual(data['total_questions'], first_page['total_questions'])
+
+    def test_404_pagination_after_last_id(self):
+        last_question = Question.query.order_by(Question.id.desc()).first()
+        response = self.client().get('/questions?after_id={}'.format(last_question.id))
+        data = json.loads(response.data)
+
+        self.assertEqual(response.status_code, 404)
+        self.assertEqual(data['success'], False)
+
+    def test_404_pagination_page_zero(self):
+        response = self.client().get('/questions?page=0')
+        data = json.loads(response.data)
+
+        self.assertEqual(response.status_code, 404)
+        self.assertEqual(data['success'], False)
+
+    def test_total_questions_follows_add_and_delete(self):
+        total_before = json.loads(self.client().get('/questions').data)['total_questions']
+        response = self.client().post('/questions', json={
+            'question': 'counted question', 'answer': 'counted answer', 'difficulty': 1, 'category': 1
+        })
+        question_id = json.loads(response.data)['created']
+        total_after_add = json.loads(self.client().get('/questions').data)['total_questions']
+        self.client().delete('/questions/{}'.format(question_id))
+        total_after_delete = json.loads(self.client().get('/questions').data)['total_questions']
+
+        self.assertEqual(total_after_add, total_before + 1)
+        self.assertEqual(total_after_delete, total_before)
+
+    def test_bulk_writes_bump_revision(self):
+        question = Question('bulk question', 'bulk answer', 1, 1)
+        question.insert()
+        question_id = question.id
+        before = revisions[Question.__tablename__]
+        Question.query.filter(Question.id == question_id).update({'difficulty': 2})
+        db.session.commit()
+        after_update = revisions[Question.__tablename__]
+        Question.query.filter(Question.id == question_id).delete()
+        db.session.commit()
+
+        self.assertEqual(after_update, before + 1)
+        self.assertEqual(revisions[Question.__tablename__], before + 2)
+        self.assertIsNone(Question.query.get(question_id))
+
     # Categories tests
     def test_categories(self):
         response = self.client().get('/categories')
@@ -62,6 +121,33 @@ class TriviaTestCase(unittest.TestCase):
         self.assertEqual(data['success'], True)
         self.assertTrue(len(data['categories']) > 0)
 
+    def test_categories_served_from_cache(self):
+        self.client().get('/categories')
+        hits_before = json.loads(self.client().get('/status/cache').data)['categories']['hits']
+        response = self.client().get('/categories')
+        data = json.loads(response.data)
+        stats = json.loads(self.client().get('/status/cache').data)['categories']
+
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(len(data['categories']) > 0)
+        self.assertEqual(stats['hits'], hits_before + 1)
+        self.assertTrue(stats['hit_rate'] > 0)
+
+    def test_categories_follow_category_writes(self):
+        self.client().get('/categories')
+        category = Category(type='Cached Category')
+        db.session.add(category)
+        db.session.commit()
+        category_id = category.id
+
+        added = json.loads(self.client().get('/categories').data)['categories']
+        db.session.delete(category)
+        db.session.commit()
+        removed = json.loads(self.client().get('/categories').data)['categories']
+
+        self.assertEqual(added[str(category_id)], 'Cached Category')
+        self.assertNotIn(str(category_id), removed)
+
     def test_404_sent_requesting_non_existing_category(self):
         response = self.client().get('/categories/9999')
         data = json.loads(response.data)
@@ -151,6 +237,48 @@ class TriviaTestCase(unittest.TestCase):
         self.assertEqual(data["success"], False)
         self.assertEqual(data["message"], "Error! Route not found.")
 
+    def test_search_ranks_question_text_over_answer_text(self):
+        in_answer = Question(question='Which word is rare?', answer='zyzzyva', difficulty=1, category=1)
+        in_question = Question(question='What is a zyzzyva?', answer='A weevil', difficulty=1, category=1)
+        in_answer.insert()
+        in_question.insert()
+        ids = [in_question.id, in_answer.id]
+
+        response = self.client().post('/questions/search', json={'searchTerm': 'Zyzzyva'})
+        data = json.loads(response.data)
+        second_page = json.loads(self.client().post('/questions/search', json={
+            'searchTerm': 'zyzzyva', 'page': 2
+        }).data)
+        for question in (in_answer, in_question):
+            question.delete()
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([question['id'] for question in data['questions']], ids)
+        self.assertEqual(data['total_questions'], 2)
+        self.assertEqual(second_page['questions'], [])
+
+    def test_422_search_page(self):
+        response = self.client().post('/questions/search', json={'searchTerm': 'title', 'page': 0})
+        data = json.loads(response.data)
+
+        self.assertEqual(response.status_code, 422)
+        self.assertEqual(data['success'], False)
+
+    def test_inverted_index_follows_inserts_and_deletes(self):
+        index = InvertedIndex(db.session, Question)
+        index.build()
+        question = Question(question='Name the quokka habitat', answer='Rottnest', difficulty=1, category=3)
+        question.insert()
+        index.row_changed('insert', question.format())
+        found, found_total = index.search('quokka')
+        index.row_changed('delete', {'id': question.id})
+        question.delete()
+        gone, gone_total = index.search('quokka')
+
+        self.assertEqual([row.id for row in found], [question.id])
+        self.assertEqual(found_total, 1)
+        self.assertEqual((gone, gone_total), ([], 0))
+
     # Category questions
     def test_get_questions_category(self):
         response = self.client().get('/categories/1/questions')
@@ -185,6 +313,140 @@ class TriviaTestCase(unittest.TestCase):
         self.assertEqual(response.status_code, 200)
         self.assertEqual(data['success'], True)
 
+    def test_quiz_skips_previous_questions(self):
+        questions = Question.query.filter(Question.category == '1').all()
+        previous = [question.id for question in questions[1:]]
+        response = self.client().post('/quizzes', json={
+            'previous_questions': previous,
+            'quiz_category': {'type': 'Science', 'id': 1}
+        })
+        data = json.loads(response.data)
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(data['question']['id'], questions[0].id)
+
+    def test_quiz_ends_when_category_exhausted(self):
+        previous = [question.id for question in Question.query.filter(Question.category == '1')]
+        response = self.client().post('/quizzes', json={
+            'previous_questions': previous,
+            'quiz_category': {'type': 'Science', 'id': 1}
+        })
+        data = json.loads(response.data)
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(data['success'], True)
+        self.assertIsNone(data['question'])
+
+    def test_quiz_follows_added_and_deleted_questions(self):
+        previous = [question.id for question in Question.query.filter(Question.category == '1')]
+        quiz_round = {'previous_questions': previous, 'quiz_category': {'type': 'Science', 'id': 1}}
+        self.client().post('/quizzes', json=quiz_round)
+
+        response = self.client().post('/questions', json={
+            'question': 'quiz question', 'answer': 'quiz answer', 'difficulty': 1, 'category': 1
+        })
+        question_id = json.loads(response.data)['created']
+        added = json.loads(self.client().post('/quizzes', json=quiz_round).data)
+        self.client().delete('/questions/{}'.format(question_id))
+        deleted = json.loads(self.client().post('/quizzes', json=quiz_round).data)
+
+        self.assertEqual(added['question']['id'], question_id)
+        self.assertIsNone(deleted['question'])
+
+    def test_row_listeners_kept_per_app(self):
+        other_app = create_app()
+        notified = []
+        on_committed_rows(other_app, Question.__tablename__, lambda op, row: notified.append(op))
+
+        response = self.client().post('/questions', json={
+            'question': 'listener question', 'answer': 'listener answer', 'difficulty': 1, 'category': 1
+        })
+        self.client().delete('/questions/{}'.format(json.loads(response.data)['created']))
+
+        self.assertEqual(notified, [])
+        self.assertTrue(self.app.extensions['row_listeners'][Question.__tablename__])
+
+    # Quiz sessions
+    def test_success_quiz_session(self):
+        category_ids = [question.id for question in Question.query.filter(Question.category == '1')]
+        response = self.client().post('/quizzes/sessions', json={
+            'quiz_category': {'type': 'Science', 'id': 1}
+        })
+        data = json.loads(response.data)
+        token = data['token']
+
+        asked = []
+        for _ in category_ids:
+            step = json.loads(self.client().post('/quizzes/sessions/{}'.format(token)).data)
+            asked.append(step['question']['id'])
+        last_step = json.loads(self.client().post('/quizzes/sessions/{}'.format(token)).data)
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(data['success'], True)
+        self.assertEqual(sorted(asked), sorted(category_ids))
+        self.assertIsNone(last_step['question'])
+
+    def test_end_quiz_session(self):
+        token = json.loads(self.client().post('/quizzes/sessions', json={
+            'quiz_category': {'type': 'click', 'id': 0}
+        }).data)['token']
+        response = self.client().delete('/quizzes/sessions/{}'.format(token))
+        data = json.loads(response.data)
+        step = self.client().post('/quizzes/sessions/{}'.format(token))
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(data['ended'], token)
+        self.assertEqual(step.status_code, 404)
+
+    def test_404_quiz_session(self):
+        response = self.client().post('/quizzes/sessions/not-a-token')
+        data = json.loads(response.data)
+
+        self.assertEqual(response.status_code, 404)
+        self.assertEqual(data['success'], False)
+
+    def test_422_quiz_session(self):
+        response = self.client().post('/quizzes/sessions', json={})
+        data = json.loads(response.data)
+
+        self.assertEqual(response.status_code, 422)
+        self.assertEqual(data['success'], False)
+
+    def test_quiz_store_persists_to_sqlite(self):
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'sessions.db')
+            quiz = QuizStore(path=path).create(1)
+            quiz.seen.add(3)
+            quiz.seen.add(1000003)
+            QuizStore(path=path).save(quiz)
+            loaded = QuizStore(path=path).get(quiz.token)
+
+        self.assertEqual(loaded.category, '1')
+        self.assertIn(1000003, loaded.seen)
+        self.assertNotIn(4, loaded.seen)
+        self.assertEqual(len(loaded.seen), 2)
+
+    def test_quiz_store_bounded_and_expiring(self):
+        store = QuizStore(max_sessions=2, ttl=60)
+        first, second, third = store.create(1), store.create(1), store.create(1)
+        third.expires_at = time.time() - 1
+
+        self.assertIsNone(store.get(first.token))
+        self.assertIsNotNone(store.get(second.token))
+        self.assertIsNone(store.get(third.token))
+
+    def test_sqlite_quiz_store_bounded_and_expiring(self):
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'sessions.db')
+            store = QuizStore(max_sessions=2, ttl=60, path=path)
+            first, second, third = store.create(1), store.create(1), store.create(1)
+            QuizStore(ttl=0, path=path).create(1)
+            store.sweep()
+            tokens = {token for token, in sqlite3.connect(path).execute('SELECT token FROM quiz_sessions')}
+
+        self.assertIsNone(store.get(first.token))
+        self.assertEqual(tokens, {second.token, third.token})
+
     def test_422_quiz(self):
         new_quiz_round = {'previous_questions': []}
         response = self.client().post('/quizzes', json=new_quiz_round)